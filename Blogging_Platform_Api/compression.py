@@ -0,0 +1,160 @@
+"""
+Response compression.
+
+CompressionMiddleware compresses text and JSON responses of GET requests with the best encoding the
+client accepts: zstd when the optional `zstandard` package is installed, gzip otherwise. Responses
+smaller than COMPRESSION_MIN_SIZE bytes are sent as they are. Streaming responses are compressed chunk
+by chunk and flushed after every chunk, so streamed lines still reach the client as they are produced.
+
+A view can attach bodies it compressed ahead of time (see `precompress`) as `response.precompressed`
+({encoding: bytes}); they are sent instead of compressing the body again, which is how cached blog
+payloads are compressed once and served many times.
+"""
+import zlib
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content types worth compressing.
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+# Incremental compressor for one response body.
+class GzipCompressor:
+    def __init__(self):
+        self.compressor = zlib.compressobj(getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6), zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class ZstdCompressor:
+    def __init__(self):
+        level = getattr(settings, 'COMPRESSION_ZSTD_LEVEL', 3)
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data) + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+# Available encodings, most preferred first.
+COMPRESSORS = {'zstd': ZstdCompressor, 'gzip': GzipCompressor} if zstandard else {'gzip': GzipCompressor}
+
+
+def compress(data, encoding):
+    compressor = COMPRESSORS[encoding]()
+    return compressor.compress(data) + compressor.finish()
+
+
+# Compresses a body with every available encoding, for responses served many times.
+# Returns {} for bodies below the size threshold.
+def precompress(data):
+    if len(data) < getattr(settings, 'COMPRESSION_MIN_SIZE', 512):
+        return {}
+    return {encoding: compress(data, encoding) for encoding in COMPRESSORS}
+
+
+# Picks the encoding to use from an Accept-Encoding header: the highest q-value wins,
+# ties go to the server's preference order. Returns None when no available encoding is accepted.
+def negotiate(accept_encoding):
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in COMPRESSORS:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_stream(content, encoding):
+    compressor = COMPRESSORS[encoding]()
+    for chunk in content:
+        if chunk:
+            yield compressor.compress(chunk)
+    yield compressor.finish()
+
+
+async def acompress_stream(content, encoding):
+    compressor = COMPRESSORS[encoding]()
+    async for chunk in content:
+        if chunk:
+            yield compressor.compress(chunk)
+    yield compressor.finish()
+
+
+# Middleware compressing responses. Works for sync and async views.
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES) or response.has_header('Content-Encoding'):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        # Only GET responses: compressing responses that mix secrets (e.g. login tokens) with
+        # attacker-controlled input would open the door to BREACH-style attacks.
+        if request.method != 'GET' or response.status_code != 200:
+            return response
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return response
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            if len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 512):
+                return response
+            precompressed = getattr(response, 'precompressed', None) or {}
+            body = precompressed.get(encoding) or compress(response.content, encoding)
+            if len(body) >= len(response.content):
+                return response
+            response.content = body
+            response['Content-Length'] = str(len(body))
+
+        # The compressed body differs from the uncompressed one byte for byte: weaken strong ETags.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,152 @@
+"""
+Read replica routing.
+
+ReplicaRoutingMiddleware picks a healthy replica from READ_REPLICAS for safe requests (GET, HEAD, OPTIONS)
+to the views of READ_REPLICA_VIEW_MODULES, and ReadReplicaRouter sends the ORM reads of that request to it.
+Everything else (writes, reads inside a transaction, other views) uses the primary ('default').
+
+After a client sends a write (POST, PUT, PATCH, DELETE), its reads stay on the primary for
+READ_REPLICA_STICKY_SECONDS so it reads its own writes while the replicas catch up. Clients are identified
+by their Authorization header, session cookie or address, and the pin is kept in READ_REPLICA_STICKY_ALIAS.
+
+Replica health is checked at most every READ_REPLICA_HEALTH_INTERVAL seconds per process; unhealthy
+replicas are skipped and reads fall back to the primary.
+"""
+import hashlib
+import random
+import threading
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Replica alias the current request reads from, None for the primary.
+read_replica = ContextVar('read_replica', default=None)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+# Database router sending reads to the replica chosen for the current request.
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = read_replica.get()
+        # Reads inside a transaction on the primary must see its uncommitted writes.
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    # Always the primary, also for instances that were loaded from a replica.
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    # Replicas hold the same rows as the primary.
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+# Per-process cache of replica health checks.
+class ReplicaHealth:
+    def __init__(self):
+        self.results = {}
+        self.lock = threading.Lock()
+
+    def is_healthy(self, alias):
+        interval = getattr(settings, 'READ_REPLICA_HEALTH_INTERVAL', 30)
+        with self.lock:
+            result = self.results.get(alias)
+        if result is not None and result[1] > time.monotonic() - interval:
+            return result[0]
+        healthy = self.check(alias)
+        with self.lock:
+            self.results[alias] = (healthy, time.monotonic())
+        return healthy
+
+    # Opens (or reuses) a connection to the replica and checks that it answers.
+    def check(self, alias):
+        try:
+            connection = connections[alias]
+            connection.ensure_connection()
+            return connection.is_usable()
+        except Exception:
+            return False
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+# Returns a random healthy replica, or None when there is none.
+def choose_replica():
+    replicas = [alias for alias in getattr(settings, 'READ_REPLICAS', []) if replica_health.is_healthy(alias)]
+    return random.choice(replicas) if replicas else None
+
+
+# Cache key pinning a client to the primary, derived from its credentials, session or address.
+def sticky_key(request):
+    client = (request.META.get('HTTP_AUTHORIZATION')
+              or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+              or request.META.get('REMOTE_ADDR', ''))
+    return 'db:sticky:' + hashlib.sha256(client.encode()).hexdigest()
+
+
+def get_sticky_cache():
+    return caches[getattr(settings, 'READ_REPLICA_STICKY_ALIAS', 'default')]
+
+
+def is_sticky(request):
+    return get_sticky_cache().get(sticky_key(request)) is not None
+
+
+def pin_to_primary(request):
+    get_sticky_cache().set(sticky_key(request), True, getattr(settings, 'READ_REPLICA_STICKY_SECONDS', 10))
+
+
+# Middleware choosing the database the request reads from. Works for sync and async views.
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = read_replica.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_replica.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = read_replica.set(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_replica.reset(token)
+        return self.finish(request, response)
+
+    # Called once the view is resolved: reads of safe requests to the configured view modules go to a replica.
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not getattr(settings, 'READ_REPLICAS', []) or request.method not in SAFE_METHODS:
+            return None
+        if view_func.__module__ not in getattr(settings, 'READ_REPLICA_VIEW_MODULES', []):
+            return None
+        if is_sticky(request):
+            return None
+        read_replica.set(choose_replica())
+        return None
+
+    # Pins the client to the primary after a successful write.
+    def finish(self, request, response):
+        if getattr(settings, 'READ_REPLICAS', []) and request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request)
+        return response
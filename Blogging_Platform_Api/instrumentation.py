@@ -0,0 +1,198 @@
+"""
+Per-request performance instrumentation.
+
+ServerTimingMiddleware records, for every request, the number of database queries and the time spent
+in them, the time spent in serializer to_representation and the total view time. The numbers are sent
+back in a Server-Timing header, logged as one structured line tagged with the URL name and, when
+SERVER_TIMING_HISTOGRAM is on, added to a rolling in-process histogram exposed by TimingStatsView.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+# Metrics of the request being handled in the current context (thread or task).
+current_metrics = ContextVar('request_metrics', default=None)
+
+# Upper bounds (milliseconds) of the histogram buckets.
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+# Timings collected for one request.
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serialize_depth = 0
+        self.view_time = 0.0
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize_time * 1000:.2f}',
+            f'view;dur={self.view_time * 1000:.2f}',
+        ])
+
+
+# Database execute wrapper counting the queries of the current request and the time spent in them.
+# The metrics are found through a context variable, which follows the request into the threads
+# sync_to_async runs the async ORM in.
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+# Installs record_query on a database connection (same mechanism as connection.execute_wrapper(),
+# but for the whole life of the connection so it also covers connections opened in other threads).
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+# Serializer mixin adding the time spent in to_representation to the current request's metrics.
+# Nested serializers are not counted twice.
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        metrics = current_metrics.get()
+        if metrics is None or metrics.serialize_depth:
+            return super().to_representation(instance)
+        metrics.serialize_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serialize_time += time.perf_counter() - started
+            metrics.serialize_depth -= 1
+
+
+# Rolling window of the latest request timings per URL name.
+class TimingHistogram:
+    def __init__(self, window=None):
+        self.window = window or getattr(settings, 'SERVER_TIMING_WINDOW', 1000)
+        self.samples = defaultdict(lambda: deque(maxlen=self.window))
+        self.lock = threading.Lock()
+
+    def add(self, url_name, metrics):
+        with self.lock:
+            self.samples[url_name].append((metrics.view_time * 1000, metrics.db_time * 1000, metrics.queries))
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    # Summary per URL name: percentiles, averages and bucket counts over the window.
+    def snapshot(self):
+        with self.lock:
+            samples = {url_name: list(values) for url_name, values in self.samples.items()}
+        stats = {}
+        for url_name, values in samples.items():
+            durations = sorted(value[0] for value in values)
+            buckets = {f'le_{bound}': 0 for bound in BUCKETS}
+            buckets['le_inf'] = 0
+            for duration in durations:
+                bound = next((bound for bound in BUCKETS if duration <= bound), None)
+                buckets[f'le_{bound}' if bound else 'le_inf'] += 1
+            stats[url_name] = {
+                'count': len(durations),
+                'p50_ms': round(percentile(durations, 0.50), 2),
+                'p90_ms': round(percentile(durations, 0.90), 2),
+                'p99_ms': round(percentile(durations, 0.99), 2),
+                'max_ms': round(durations[-1], 2),
+                'avg_db_ms': round(sum(value[1] for value in values) / len(values), 2),
+                'avg_queries': round(sum(value[2] for value in values) / len(values), 2),
+                'buckets': buckets,
+            }
+        return stats
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+histogram = TimingHistogram()
+
+
+# Middleware collecting the metrics of each request. Works for sync and async views.
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        # Connections opened before this module was loaded did not go through connection_created.
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    def finish(self, request, response, metrics, started):
+        metrics.view_time = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.view_name if match else 'unresolved'
+        response['Server-Timing'] = metrics.server_timing()
+        logger.info(
+            'url_name=%s method=%s status=%s queries=%d db_ms=%.2f serialize_ms=%.2f view_ms=%.2f',
+            url_name, request.method, response.status_code, metrics.queries,
+            metrics.db_time * 1000, metrics.serialize_time * 1000, metrics.view_time * 1000,
+            extra={
+                'url_name': url_name,
+                'queries': metrics.queries,
+                'db_ms': metrics.db_time * 1000,
+                'serialize_ms': metrics.serialize_time * 1000,
+                'view_ms': metrics.view_time * 1000,
+            },
+        )
+        if getattr(settings, 'SERVER_TIMING_HISTOGRAM', False):
+            histogram.add(url_name, metrics)
+        return response
+
+
+# TimingStatsView exposes the rolling request timing histogram to admin users.
+class TimingStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(histogram.snapshot(), status=200)
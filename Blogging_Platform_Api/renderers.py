@@ -0,0 +1,81 @@
+"""
+Fast JSON rendering and parsing.
+
+FastJSONRenderer and FastJSONParser replace DRF's JSONRenderer and JSONParser (see REST_FRAMEWORK in
+settings). They encode and decode with the optional `orjson` package when it is installed, which handles
+datetimes, dates, times, UUIDs and dataclasses natively, and fall back to the standard library otherwise,
+with a single reusable encoder instead of one per response. Both paths produce the same JSON as DRF:
+compact, UTF-8 (no ASCII escaping), UTC datetimes ending in 'Z', Decimals as numbers, and U+2028/U+2029
+escaped so the output can be embedded in JavaScript.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import json
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Types neither encoder handles natively (lazy translations, querysets, Decimals for orjson...)
+# go through DRF's encoder.
+drf_encoder = JSONEncoder()
+
+# NaN and infinities are rejected, as by DRF's strict JSON.
+stdlib_encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'), check_circular=False, allow_nan=False)
+
+
+def escape_separators(data):
+    if b'\xe2\x80' in data:
+        data = data.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return data
+
+
+def stdlib_dumps(data):
+    return escape_separators(stdlib_encoder.encode(data).encode())
+
+
+# DRF's loads, rejecting NaN and infinities.
+def stdlib_loads(data):
+    return json.loads(data)
+
+
+def orjson_dumps(data):
+    return escape_separators(orjson.dumps(data, default=drf_encoder.default, option=ORJSON_OPTIONS))
+
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    # dumps(data) encodes data as UTF-8 JSON bytes, loads(data) decodes JSON from bytes or str.
+    dumps, loads = orjson_dumps, orjson.loads
+else:
+    dumps, loads = stdlib_dumps, stdlib_loads
+
+
+# Renders responses with `dumps`. Indented output (the browsable API, or '; indent=N' in the Accept header)
+# is left to DRF's renderer.
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+# Parses request bodies with `loads`.
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        body = stream.read() if stream is not None else b''
+        try:
+            if encoding.lower().replace('-', '') != 'utf8':
+                body = body.decode(encoding)
+            return loads(body)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % exc)
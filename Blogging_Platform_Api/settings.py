@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,9 +43,16 @@ INSTALLED_APPS = [
     'blog',
     'django_filters',
     'rest_framework.authtoken',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    # Per-request Server-Timing headers, timing logs and histogram (first, so it measures everything).
+    'Blogging_Platform_Api.instrumentation.ServerTimingMiddleware',
+    # gzip/zstd compression of GET responses (see COMPRESSION_MIN_SIZE), before anything reading the body.
+    'Blogging_Platform_Api.compression.CompressionMiddleware',
+    # Sends the reads of GET requests to a read replica (see READ_REPLICAS).
+    'Blogging_Platform_Api.db.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,13 +86,107 @@ WSGI_APPLICATION = 'Blogging_Platform_Api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# sqlite tuning: the busy timeout (seconds) makes a writer wait for the lock instead of failing with
+# "database is locked", and IMMEDIATE transactions take the write lock when they start instead of failing
+# to upgrade a read lock later. WAL mode, which lets readers run while a write is in progress, is stored in
+# the database file, so it is enabled once per database (see the README) rather than on every connection;
+# synchronous=NORMAL is safe with WAL and is a per-connection setting.
+SQLITE_OPTIONS = {
+    'init_command': 'PRAGMA synchronous=NORMAL',
+    'timeout': 20,
+    'transaction_mode': 'IMMEDIATE',
+}
+
+# Persistent connections: a connection is reused for CONN_MAX_AGE seconds and checked before reuse.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': SQLITE_OPTIONS,
     }
 }
 
+# Optional read replica: a second sqlite file kept in sync with the primary (DATABASE_REPLICA=/path/to/file).
+# Tests read it through the primary's test database.
+if os.environ.get('DATABASE_REPLICA'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DATABASE_REPLICA'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Read replicas: GET requests to the views of READ_REPLICA_VIEW_MODULES read from a healthy replica
+# (checked every READ_REPLICA_HEALTH_INTERVAL seconds), except for clients that wrote in the last
+# READ_REPLICA_STICKY_SECONDS (tracked in the READ_REPLICA_STICKY_ALIAS cache), which read from the primary.
+DATABASE_ROUTERS = ['Blogging_Platform_Api.db.ReadReplicaRouter']
+READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+READ_REPLICA_VIEW_MODULES = ['blog.views', 'blog.async_views', 'accounts.views']
+READ_REPLICA_STICKY_SECONDS = 10
+READ_REPLICA_STICKY_ALIAS = 'default'
+READ_REPLICA_HEALTH_INTERVAL = 30
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'blogging-platform',
+    }
+}
+
+# Cache alias and timeout (seconds) for serialized blog detail payloads and list pages.
+BLOG_CACHE_ALIAS = 'default'
+BLOG_CACHE_TIMEOUT = 300
+
+
+# Response compression: minimum body size (bytes) and compression levels (zstd needs the zstandard package).
+COMPRESSION_MIN_SIZE = 512
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_ZSTD_LEVEL = 3
+
+
+# Token authentication cache: maximum entries, time to live (seconds) in the shared cache named by
+# TOKEN_CACHE_ALIAS, and in the in-process cache used without it. Set TOKEN_CACHE_ALIAS to a cache shared
+# by all processes (e.g. Redis or Memcached) when running several: in-process entries do not see the
+# logouts and deactivations of other processes until they expire.
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TIMEOUT = 60
+TOKEN_CACHE_LOCAL_TIMEOUT = 5
+TOKEN_CACHE_ALIAS = None
+
+
+# Request instrumentation: keep a rolling histogram of the latest SERVER_TIMING_WINDOW requests per URL name.
+SERVER_TIMING_HISTOGRAM = True
+SERVER_TIMING_WINDOW = 1000
+
+
+# Background jobs (see jobs.queue and the run_jobs command): jobs claimed per batch, worker poll interval,
+# attempts before a job is marked failed, retry backoff (base and maximum seconds), seconds after which
+# a claimed job is considered abandoned, and JOBS_INLINE to run handlers in-process after commit instead.
+JOBS_BATCH_SIZE = 100
+JOBS_POLL_INTERVAL = 1
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BASE = 5
+JOBS_RETRY_MAX = 3600
+JOBS_LOCK_TIMEOUT = 600
+JOBS_INLINE = False
+
+# Related blogs (see blog.related): blogs kept per blog, score added for a shared category, and the latest
+# published blogs of each tag considered as candidates (bounds the work for very common tags).
+RELATED_POSTS_SIZE = 10
+RELATED_CATEGORY_WEIGHT = 1.0
+RELATED_MAX_POSTINGS = 500
+
+# Autocomplete (see blog.autocomplete): seconds before the in-memory indexes are rebuilt from the database,
+# whether published blog titles are indexed besides tags, and the number of (latest) titles indexed.
+AUTOCOMPLETE_REFRESH = 300
+AUTOCOMPLETE_TITLES = True
+AUTOCOMPLETE_MAX_TITLES = 100000
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -124,6 +226,24 @@ STATIC_URL = 'static/'
 
 STATIC_ROOT = BASE_DIR / 'static'
 
+# Uploaded files (profile pictures)
+MEDIA_URL = 'media/'
+
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Uploads are streamed to a temporary file on disk instead of being buffered in memory.
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+
+# Profile pictures: maximum upload size (bytes), square variant sizes (pixels) and formats, encoder quality,
+# and the worker pool building them (PROFILE_PIC_WORKERS threads, 0 to build them inline, with at most
+# PROFILE_PIC_QUEUE_SIZE pictures waiting).
+PROFILE_PIC_MAX_SIZE = 10 * 1024 * 1024
+PROFILE_PIC_SIZES = {'small': 64, 'medium': 256}
+PROFILE_PIC_FORMATS = ['webp', 'jpeg']
+PROFILE_PIC_QUALITY = 85
+PROFILE_PIC_WORKERS = 2
+PROFILE_PIC_QUEUE_SIZE = 100
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -138,9 +258,19 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
     ]
     ,
+    # orjson-backed JSON renderer and parser (stdlib fallback), see Blogging_Platform_Api/renderers.py.
+    'DEFAULT_RENDERER_CLASSES': [
+        'Blogging_Platform_Api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'Blogging_Platform_Api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     # Pagination using LimitOffsetPagination for result control.
     'DEFAULT_PAGINATION_CLASS':'rest_framework.pagination.LimitOffsetPagination',
     # DjangoFilterBackend for enabling filtering of querysets.
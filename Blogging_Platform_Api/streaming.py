@@ -0,0 +1,53 @@
+"""
+Streaming JSON responses.
+
+Querysets are read from the database and serialized chunk by chunk, and sent as one JSON array
+('?stream=json') or as one JSON document per line ('?stream=ndjson'), so exports of any size run in
+constant memory.
+"""
+from django.http import StreamingHttpResponse
+from .renderers import dumps
+
+# Streaming formats ('?stream=json' or '?stream=ndjson') and their content types.
+STREAM_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Number of rows fetched from the database and written to the response at a time.
+CHUNK_SIZE = 500
+
+
+# Returns the streaming format requested with the 'stream' query parameter, or None.
+def get_stream_format(request):
+    stream_format = request.query_params.get('stream')
+    return stream_format if stream_format in STREAM_FORMATS else None
+
+
+# Serializes the rows chunk by chunk with the given serializer instance (its fields are only set up once),
+# as one JSON array or as one JSON document per line.
+def generate(rows, stream_format, serializer):
+    chunk = []
+    first = True
+    if stream_format == 'json':
+        yield b'['
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        chunk.append(dumps(serializer.to_representation(row)))
+        if len(chunk) == CHUNK_SIZE:
+            yield render_chunk(chunk, stream_format, first)
+            chunk, first = [], False
+    if chunk:
+        yield render_chunk(chunk, stream_format, first)
+    if stream_format == 'json':
+        yield b']'
+
+
+def render_chunk(chunk, stream_format, first):
+    if stream_format == 'ndjson':
+        return b'\n'.join(chunk) + b'\n'
+    return (b'' if first else b',') + b','.join(chunk)
+
+
+# Streams a queryset (or any object with iterator(chunk_size)) without holding it all in memory.
+def stream(rows, stream_format, serializer):
+    return StreamingHttpResponse(generate(rows, stream_format, serializer), content_type=STREAM_FORMATS[stream_format])
@@ -14,8 +14,11 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
+from .instrumentation import TimingStatsView
 
 urlpatterns = [
     # Admin interface at /admin/
@@ -24,4 +27,9 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     # Includes URLs for the 'blog' app (blog-related views).
     path('blog/', include('blog.urls')),
+    # Rolling request timing histogram per URL name (admin only).
+    path('stats/timings/', TimingStatsView.as_view(), name='stats/timings'),
 ]
+
+# Serves uploaded files (profile pictures and their variants) in development.
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
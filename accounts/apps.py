@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from rest_framework.authtoken.models import Token
+        from .authentication import drop_deleted_token
+        post_delete.connect(drop_deleted_token, sender=Token, dispatch_uid='accounts.authentication.drop_deleted_token')
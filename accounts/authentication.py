@@ -0,0 +1,104 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from .models import User
+
+
+# Bounded in-process LRU cache with a time to live, mapping token keys to (user id, is_active) pairs.
+# When TOKEN_CACHE_ALIAS names a Django cache, that shared cache is used instead so that invalidations
+# are seen by every process; it is required with several processes. Without it, an invalidation only
+# reaches the process it happens in, so entries only live TOKEN_CACHE_LOCAL_TIMEOUT seconds.
+class TokenCache:
+    def __init__(self, maxsize=None, timeout=None, alias=None):
+        self.maxsize = maxsize or getattr(settings, 'TOKEN_CACHE_SIZE', 10000)
+        self.alias = alias or getattr(settings, 'TOKEN_CACHE_ALIAS', None)
+        if self.alias:
+            self.timeout = timeout or getattr(settings, 'TOKEN_CACHE_TIMEOUT', 60)
+        else:
+            self.timeout = timeout or getattr(settings, 'TOKEN_CACHE_LOCAL_TIMEOUT', 5)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Token keys are hashed so raw credentials never end up as cache keys.
+    def make_key(self, key):
+        return 'auth:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        if self.alias:
+            return caches[self.alias].get(self.make_key(key))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        if self.alias:
+            caches[self.alias].set(self.make_key(key), value, self.timeout)
+            return
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        if self.alias:
+            caches[self.alias].delete(self.make_key(key))
+            return
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        if self.alias:
+            return
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache()
+
+
+# Token authentication resolving token keys through token_cache, the database is only hit on a miss.
+# A hit gives a user with only its id and active flag loaded: any other field is read from the database
+# when it is first used, so a request never sees (or writes back) a stale copy of the user.
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            user_id, is_active = cached
+            if not is_active:
+                raise AuthenticationFailed('User inactive or deleted.')
+            user = User.from_db(None, ['id', 'is_active'], [user_id, is_active])
+            return (user, self.get_model()(key=key, user=user))
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, (user.pk, user.is_active))
+        return (user, token)
+
+
+# Drops a token from the cache, e.g. before it is deleted on logout.
+def invalidate_token(key):
+    token_cache.delete(key)
+
+
+# Drops the cached tokens of a user after the user was deactivated or reactivated.
+def invalidate_user(user):
+    for key in Token.objects.filter(user_id=user.pk).values_list('key', flat=True):
+        token_cache.delete(key)
+
+
+# post_delete receiver for Token (connected in AccountsConfig.ready): deleted tokens, including those
+# deleted outside the API (admin, shell) and those of deleted users (cascade), stop authenticating right away.
+def drop_deleted_token(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
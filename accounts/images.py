@@ -0,0 +1,317 @@
+import logging
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+from jobs.queue import enqueue
+
+logger = logging.getLogger(__name__)
+
+# Profile picture pipeline: after an upload is committed, a bounded pool of worker threads strips the
+# metadata (EXIF, GPS, XMP, comments...) from the bytes of the original, without re-encoding it, then
+# decodes it once and writes fixed-size square variants in every configured format. The variant names
+# are stored on the user (User.profile_pic_variants), so serializers expose them without touching the storage.
+
+# Pillow format name and file extension per variant format.
+FORMATS = {'webp': ('WEBP', 'webp'), 'jpeg': ('JPEG', 'jpg')}
+
+
+def get_sizes():
+    return getattr(settings, 'PROFILE_PIC_SIZES', {'small': 64, 'medium': 256})
+
+
+def get_formats():
+    return getattr(settings, 'PROFILE_PIC_FORMATS', ['webp', 'jpeg'])
+
+
+# Storage name of a variant: profile_pics/variants/<original name>_<size>.<ext>
+def variant_name(name, size_name, image_format):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'profile_pics/variants/{stem}_{size_name}.{FORMATS[image_format][1]}'
+
+
+# Encodes an image without any metadata (Pillow only writes EXIF/ICC data when it is passed explicitly).
+def encode(image, image_format):
+    buffer = BytesIO()
+    image.save(buffer, FORMATS[image_format][0], quality=getattr(settings, 'PROFILE_PIC_QUALITY', 85))
+    return buffer.getvalue()
+
+
+# Formats accepted for profile pictures, those whose metadata strip_metadata removes. Phone photos are
+# often MPO files: JPEG files followed by more images (each with its own EXIF data).
+ACCEPTED_FORMATS = ('JPEG', 'MPO', 'PNG', 'WEBP')
+
+EXIF_ORIENTATION = 0x0112
+
+
+# Minimal EXIF block carrying only an orientation, so a stripped picture displays the same way.
+def orientation_exif(orientation):
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = orientation
+    return exif.tobytes()
+
+
+# Raised by the strippers for files they cannot parse, e.g. truncated uploads (which Pillow opens lazily,
+# so they pass its validation). Such a file cannot be stripped and is never served.
+class StripError(ValueError):
+    pass
+
+
+# End of the entropy-coded data of a JPEG scan: the next marker other than stuffed bytes and restart markers.
+def scan_end(data, position):
+    while True:
+        position = data.find(b'\xff', position)
+        if position == -1 or position + 1 >= len(data):
+            raise StripError('Truncated JPEG scan.')
+        following = data[position + 1]
+        if following != 0 and not 0xD0 <= following <= 0xD7:
+            return position
+        position += 2
+
+
+# Drops the APP1-APP13 and APP15 segments (EXIF, XMP, IPTC, MPO index...) and comments of a JPEG, and
+# anything after its first image (the other images of an MPO file). APP0 (JFIF), APP14 (Adobe color
+# transform) and ICC profiles (APP2) are kept, the compressed image data is copied as is.
+def strip_jpeg(data, exif=None):
+    if not data.startswith(b'\xff\xd8'):
+        raise StripError('Not a JPEG file.')
+    segments = []
+    position = 2
+    while True:
+        if position + 2 > len(data):
+            raise StripError('Truncated JPEG file.')
+        if data[position] != 0xFF:
+            raise StripError('Invalid JPEG segment.')
+        marker = data[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker == 0xD9:
+            break
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            segments.append(data[position:position + 2])
+            position += 2
+            continue
+        end = position + 2 + int.from_bytes(data[position + 2:position + 4], 'big')
+        if end > len(data):
+            raise StripError('Truncated JPEG segment.')
+        if marker == 0xDA:
+            end = scan_end(data, end)
+        icc_profile = marker == 0xE2 and data[position + 4:position + 16] == b'ICC_PROFILE\x00'
+        metadata = marker == 0xFE or (0xE1 <= marker <= 0xEF and marker != 0xEE and not icc_profile)
+        if not metadata:
+            segments.append(data[position:end])
+        position = end
+    if exif:
+        # After the JFIF segment, which must come first.
+        at = 1 if segments and segments[0][1] == 0xE0 else 0
+        segments.insert(at, b'\xff\xe1' + (len(exif) + 2).to_bytes(2, 'big') + exif)
+    return b'\xff\xd8' + b''.join(segments) + b'\xff\xd9'
+
+
+# PNG chunks holding metadata: EXIF, text (comments, XMP) and modification time.
+PNG_METADATA_CHUNKS = (b'eXIf', b'tEXt', b'zTXt', b'iTXt', b'tIME')
+
+
+def png_chunk(chunk_type, chunk_data):
+    return (len(chunk_data).to_bytes(4, 'big') + chunk_type + chunk_data
+            + zlib.crc32(chunk_type + chunk_data).to_bytes(4, 'big'))
+
+
+# Drops the metadata chunks of a PNG, keeping its image data and color profile as they are.
+def strip_png(data, exif=None):
+    signature = b'\x89PNG\r\n\x1a\n'
+    if not data.startswith(signature):
+        raise StripError('Not a PNG file.')
+    chunks = []
+    position = len(signature)
+    while True:
+        length = int.from_bytes(data[position:position + 4], 'big')
+        chunk_type = data[position + 4:position + 8]
+        end = position + 12 + length
+        if end > len(data):
+            raise StripError('Truncated PNG file.')
+        if chunk_type not in PNG_METADATA_CHUNKS:
+            chunks.append(data[position:end])
+            if chunk_type == b'IHDR' and exif:
+                chunks.append(png_chunk(b'eXIf', exif[6:]))
+        if chunk_type == b'IEND':
+            break
+        position = end
+    return signature + b''.join(chunks)
+
+
+# VP8X flags of the EXIF and XMP chunks.
+WEBP_EXIF_FLAG = 0x08
+WEBP_XMP_FLAG = 0x04
+
+
+# Drops the EXIF and XMP chunks of a WEBP (and their VP8X flags), keeping its image data and color profile.
+def strip_webp(data, exif=None):
+    if data[:4] != b'RIFF' or data[8:12] != b'WEBP':
+        raise StripError('Not a WEBP file.')
+    chunks = []
+    extended = False
+    position = 12
+    while position < len(data):
+        chunk_type = data[position:position + 4]
+        length = int.from_bytes(data[position + 4:position + 8], 'little')
+        end = position + 8 + length + (length & 1)
+        if position + 8 + length > len(data):
+            raise StripError('Truncated WEBP file.')
+        chunk = data[position:end]
+        if chunk_type == b'VP8X':
+            extended = True
+            flags = chunk[8] & ~(WEBP_EXIF_FLAG | WEBP_XMP_FLAG) | (WEBP_EXIF_FLAG if exif else 0)
+            chunk = chunk[:8] + bytes([flags]) + chunk[9:]
+        if chunk_type not in (b'EXIF', b'XMP '):
+            chunks.append(chunk)
+        position = end
+    # Simple (non VP8X) files cannot carry EXIF data, so they have no orientation to keep.
+    if exif and extended:
+        exif = exif[6:]
+        chunks.append(b'EXIF' + len(exif).to_bytes(4, 'little') + exif + b'\x00' * (len(exif) & 1))
+    body = b'WEBP' + b''.join(chunks)
+    return b'RIFF' + len(body).to_bytes(4, 'little') + body
+
+
+STRIPPERS = {'JPEG': strip_jpeg, 'MPO': strip_jpeg, 'PNG': strip_png, 'WEBP': strip_webp}
+
+
+# Returns the bytes of a picture without its metadata, in its own format, without re-encoding it.
+# Only the EXIF orientation is kept. Raises StripError for files that cannot be parsed.
+def strip_metadata(data, image_format, orientation=1):
+    exif = orientation_exif(orientation) if orientation != 1 else None
+    return STRIPPERS[image_format](data, exif)
+
+
+# Rewrites the original picture without its metadata. Returns its storage name, which changes if another
+# file took the name in the meantime.
+def strip_original(name, data):
+    default_storage.delete(name)
+    return default_storage.save(name, ContentFile(data))
+
+
+# Builds every variant of a stored profile picture. The original is rewritten without metadata when it
+# carries some, and deleted (StripError raised) when it cannot be stripped, so its metadata is never served.
+# Returns the name of the original and the names of its variants ({size: {format: name}}).
+def make_variants(name):
+    with default_storage.open(name, 'rb') as file:
+        data = file.read()
+    image = Image.open(BytesIO(data))
+    try:
+        stripped = strip_metadata(data, image.format, image.getexif().get(EXIF_ORIENTATION, 1))
+    except (StripError, KeyError) as error:
+        default_storage.delete(name)
+        raise StripError(f'Profile picture {name} ({image.format}) cannot be stripped.') from error
+    if stripped != data:
+        name = strip_original(name, stripped)
+    # Variants are encoded from the decoded image, which carries no metadata, upright and in RGB.
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    variants = {}
+    for size_name, size in get_sizes().items():
+        resized = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        variants[size_name] = {}
+        for image_format in get_formats():
+            target = variant_name(name, size_name, image_format)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            variants[size_name][image_format] = default_storage.save(target, ContentFile(encode(resized, image_format)))
+    return name, variants
+
+
+# Worker task: builds the variants of a user's picture and stores their names, unless the user uploaded
+# another picture in the meantime. Variants of the previous picture are deleted.
+# A picture that cannot be stripped is removed from the user.
+def process_profile_pic(user_id, name, previous_variants):
+    from .models import User
+
+    try:
+        stripped_name, variants = make_variants(name)
+    except StripError:
+        logger.warning('Profile picture %s of user %s cannot be stripped, removed', name, user_id, exc_info=True)
+        if User.objects.filter(pk=user_id, profile_pic=name).update(profile_pic='', profile_pic_variants={}):
+            delete_variants(previous_variants)
+        return
+    updated = User.objects.filter(pk=user_id, profile_pic=name).update(profile_pic=stripped_name, profile_pic_variants=variants)
+    delete_variants(previous_variants if updated else variants)
+
+
+def get_workers():
+    return getattr(settings, 'PROFILE_PIC_WORKERS', 2)
+
+
+# Bounded pool: at most PROFILE_PIC_WORKERS resizes run at once and at most PROFILE_PIC_QUEUE_SIZE wait.
+# Submitting more never blocks the caller (a request thread): the task is queued as a background job
+# (jobs.queue) instead. With PROFILE_PIC_WORKERS = 0, pictures are processed inline.
+class ImagePool:
+    def __init__(self):
+        self.executor = None
+        self.slots = None
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                workers = get_workers()
+                self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='profile-pic')
+                self.slots = threading.BoundedSemaphore(workers + getattr(settings, 'PROFILE_PIC_QUEUE_SIZE', 100))
+        return self.executor
+
+    def submit(self, function, *args):
+        if not get_workers():
+            function(*args)
+            return
+        executor = self.get_executor()
+        if not self.slots.acquire(blocking=False):
+            enqueue('accounts.images.task_job', {'task': function.__name__, 'args': list(args)})
+            return None
+        future = executor.submit(run, function, *args)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+
+# Runs a task in a worker thread with the same database connection handling as a request, logging its failures.
+def run(function, *args):
+    close_old_connections()
+    try:
+        function(*args)
+    except Exception:
+        logger.exception('Profile picture task %s%r failed', function.__name__, args)
+    finally:
+        close_old_connections()
+
+
+pool = ImagePool()
+
+
+# Background job handler (jobs.queue) for the tasks the pool had no room for ({'task', 'args'} payloads).
+def task_job(payloads):
+    for payload in payloads:
+        TASKS[payload['task']](*payload['args'])
+
+
+# Deletes the variant files of a previous picture.
+def delete_variants(variants):
+    for formats in variants.values():
+        for name in formats.values():
+            default_storage.delete(name)
+
+
+# Queues the variants of a user's new picture once the transaction that saved it commits
+# (or only drops the previous ones when the picture was removed).
+def schedule_variants(user, previous_variants):
+    if user.profile_pic:
+        name = user.profile_pic.name
+        transaction.on_commit(lambda: pool.submit(process_profile_pic, user.pk, name, previous_variants))
+    elif previous_variants:
+        transaction.on_commit(lambda: pool.submit(delete_variants, previous_variants))
+
+
+TASKS = {task.__name__: task for task in (process_profile_pic, delete_variants)}
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 # Create your models here.
 
@@ -9,4 +9,32 @@ class User(AbstractUser):
                            help_text="A short bio about the user.")
     # Profile picture field for uploading images (optional)
     profile_pic = models.ImageField(upload_to="profile_pics", default="",null=True, blank=True, 
-                                    help_text="Upload a profile picture.")
\ No newline at end of file
+                                    help_text="Upload a profile picture.")
+    # Storage names of the resized copies of profile_pic ({size: {format: name}}), filled in by accounts.images.
+    profile_pic_variants = models.JSONField(default=dict, blank=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Admin user list: pages in id order, filtered on the active flag or the signup date.
+            models.Index(fields=['is_active', 'id'], name='user_active_idx'),
+            models.Index(fields=['date_joined', 'id'], name='user_date_joined_idx'),
+        ]
+
+    # Remembers the active flag as loaded (None if deferred), so save() can tell when it changes.
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user._loaded_is_active = user.__dict__.get('is_active')
+        return user
+
+    # Deactivated users must stop authenticating right away and reactivated ones must authenticate again, so
+    # the cached tokens of a user whose active flag changed are dropped once the save commits.
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if 'is_active' in self.get_deferred_fields():
+            return
+        previous, self._loaded_is_active = getattr(self, '_loaded_is_active', None), self.is_active
+        if (previous != self.is_active) if previous is not None else not adding:
+            from .authentication import invalidate_user
+            transaction.on_commit(lambda: invalidate_user(self))
@@ -0,0 +1,10 @@
+from rest_framework.pagination import CursorPagination
+
+
+# Cursor pagination for the user list, keyed on the primary key: every page is an index range scan
+# ("id > last id"), however deep, and no COUNT(*) is run.
+class UserCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 500
@@ -2,25 +2,76 @@ from rest_framework import serializers
 from .models import User
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
+from .images import ACCEPTED_FORMATS, StripError, schedule_variants, strip_metadata
+from django.conf import settings
+from django.core.files.storage import default_storage
+from Blogging_Platform_Api.instrumentation import TimedSerializerMixin
 
 # Serializer for user data (id, username, email, bio, and profile_pic).
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # URLs of the resized copies of the profile picture ({size: {format: url}}), empty until they are built.
+    profile_pic_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'bio', 'profile_pic']
+        fields = ['id', 'username', 'email', 'bio', 'profile_pic', 'profile_pic_variants']
+
+    def validate_profile_pic(self, value):
+        max_size = settings.PROFILE_PIC_MAX_SIZE
+        if value and value.size > max_size:
+            raise serializers.ValidationError(f"The picture must not exceed {max_size // (1024 * 1024)} MB.")
+        # Only formats whose metadata can be stripped are accepted.
+        image = getattr(value, 'image', None)
+        if value and image is not None and image.format not in ACCEPTED_FORMATS:
+            raise serializers.ValidationError("The picture must be a JPEG, PNG or WEBP image.")
+        # Files the strippers cannot parse (e.g. truncated uploads) are rejected.
+        if value and image is not None:
+            value.seek(0)
+            try:
+                strip_metadata(value.read(), image.format)
+            except StripError:
+                raise serializers.ValidationError("The picture is damaged or truncated.")
+            finally:
+                value.seek(0)
+        return value
+
+    def get_profile_pic_variants(self, obj):
+        request = self.context.get('request')
+        urls = {}
+        for size_name, formats in (obj.profile_pic_variants or {}).items():
+            urls[size_name] = {}
+            for image_format, name in formats.items():
+                url = default_storage.url(name)
+                urls[size_name][image_format] = request.build_absolute_uri(url) if request else url
+        return urls
 
     # Custom update method to update user information.
     def update(self, instance, validated_data):
         instance.username = validated_data.get('username', instance.username)
         instance.email = validated_data.get('email', instance.email)
         instance.bio = validated_data.get('bio', instance.bio)
-        instance.profile_pic = validated_data.get('profile_pic', instance.profile_pic)
+        previous_variants = instance.profile_pic_variants
+        new_pic = 'profile_pic' in validated_data
+        if new_pic:
+            # A new picture: its variants are built in the background once it is saved.
+            instance.profile_pic = validated_data['profile_pic']
+            instance.profile_pic_variants = {}
         instance.save()
+        if new_pic:
+            schedule_variants(instance, previous_variants)
         return instance
     
 
+# Serializer for the admin user list. UserListView loads only these columns.
+class UserListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'email', 'date_joined', 'is_active']
+        read_only_fields = fields
+
+
 # Serializer for registering a new user, used to validate input data and create a new user.
-class UserRegisterSerializer(serializers.ModelSerializer):
+class UserRegisterSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['username', 'email', 'password']
@@ -1,3 +1,280 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+from jobs.queue import Worker
+from . import images
+from .authentication import CachedTokenAuthentication, token_cache
+from .models import User
+from .serializers import UserSerializer
 
-# Create your tests here.
+
+# Token authentication cache: hits skip the database, logout and deactivation take effect immediately.
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='password')
+        self.token = Token.objects.create(user=self.user)
+        self.authentication = CachedTokenAuthentication()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cached_lookup(self):
+        with self.assertNumQueries(1):
+            self.authentication.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, token = self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_logout_invalidates_token(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        response = self.client.post('/accounts/user/logout/')
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_deactivation_invalidates_token(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+        # Saving an inactive user without changing the flag leaves the cache alone
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.user.save()
+        self.assertEqual(callbacks, [])
+        self.assertFalse([query for query in queries if Token._meta.db_table in query['sql']])
+
+    def test_reactivation_invalidates_token(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        # An inactive entry cached in the meantime is dropped by the reactivation
+        token_cache.set(self.token.key, (user.pk, False))
+        user.is_active = True
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        authenticated, _ = self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(authenticated.pk, user.pk)
+
+    def test_cached_user_is_never_stale(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        self.client.put(f'/accounts/user/update/{self.user.pk}/', {'bio': 'New bio'}, format='json')
+        user, _ = self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(user.bio, 'New bio')
+        # Changes made elsewhere while the token is cached are not written back by the next update
+        admin_copy = User.objects.get(pk=self.user.pk)
+        admin_copy.set_password('new password')
+        admin_copy.is_staff = True
+        admin_copy.save()
+        response = self.client.put(f'/accounts/user/update/{self.user.pk}/', {'bio': 'Newer bio'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.bio, self.user.is_staff), ('Newer bio', True))
+        self.assertTrue(self.user.check_password('new password'))
+
+    def test_deleted_tokens_and_users_stop_authenticating(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        Token.objects.filter(pk=self.token.pk).delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+        token = Token.objects.create(user=self.user)
+        self.authentication.authenticate_credentials(token.key)
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(token.key)
+
+
+# Profile pictures: variants are built after the upload commits, without metadata, and exposed as URLs.
+@override_settings(PROFILE_PIC_WORKERS=0)
+class ProfilePicTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    # Encodes an image with EXIF data (camera maker, GPS position and the given orientation).
+    def encode(self, image, image_format, orientation=1, **options):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        exif[0x0112] = orientation
+        exif.get_ifd(0x8825)[2] = (48.0, 51.0, 24.0)
+        buffer = BytesIO()
+        image.save(buffer, image_format, exif=exif, **options)
+        return buffer.getvalue()
+
+    def upload(self, size=(800, 600), data=None, file_name='avatar.jpg'):
+        data = data or self.encode(Image.new('RGB', size, 'red'), 'JPEG')
+        picture = SimpleUploadedFile(file_name, data, content_type='application/octet-stream')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(f'/accounts/user/update/{self.user.id}/', {'profile_pic': picture}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        # Variants are not ready in the response itself
+        self.assertEqual(response.json()['profile_pic_variants'], {})
+        self.user.refresh_from_db()
+        return self.user.profile_pic_variants
+
+    def test_variants_built_without_metadata(self):
+        variants = self.upload()
+        self.assertEqual(set(variants), {'small', 'medium'})
+        with default_storage.open(variants['small']['webp']) as file:
+            image = Image.open(file)
+            self.assertEqual((image.format, image.size), ('WEBP', (64, 64)))
+        with default_storage.open(variants['medium']['jpeg']) as file:
+            image = Image.open(file)
+            self.assertEqual(image.size, (256, 256))
+            self.assertNotIn('exif', image.info)
+        with default_storage.open(self.user.profile_pic.name) as file:
+            self.assertNotIn('exif', Image.open(file).info)
+        data = UserSerializer(self.user).data
+        self.assertTrue(data['profile_pic_variants']['small']['jpeg'].endswith('_small.jpg'))
+
+    def test_new_picture_replaces_variants(self):
+        old = self.upload()
+        new = self.upload(size=(300, 300))
+        self.assertFalse(default_storage.exists(old['small']['webp']))
+        self.assertTrue(default_storage.exists(new['small']['webp']))
+
+    def stored_original(self):
+        with default_storage.open(self.user.profile_pic.name) as file:
+            image = Image.open(file)
+            image.load()
+        return image
+
+    def test_original_stripped_without_reencoding(self):
+        original = Image.effect_noise((120, 80), 60).convert('RGB')
+        data = self.encode(original, 'JPEG', orientation=6, quality=70)
+        self.upload(data=data)
+        stored = self.stored_original()
+        # Same compressed pixels, only the orientation is left of the EXIF data
+        self.assertEqual(stored.tobytes(), Image.open(BytesIO(data)).tobytes())
+        self.assertEqual(dict(stored.getexif()), {0x0112: 6})
+        # The variants are upright
+        with default_storage.open(self.user.profile_pic_variants['medium']['jpeg']) as file:
+            self.assertEqual(Image.open(file).size, (256, 256))
+
+    def test_phone_photos_stripped(self):
+        # MPO files: every image carries EXIF data, only the first image is kept
+        frames = [Image.new('RGB', (100, 100), color) for color in ('red', 'blue')]
+        data = self.encode(frames[0], 'MPO', save_all=True, append_images=frames[1:])
+        self.assertEqual(Image.open(BytesIO(data)).format, 'MPO')
+        self.upload(data=data)
+        stored = self.stored_original()
+        self.assertEqual((stored.format, len(stored.getexif())), ('JPEG', 0))
+        with default_storage.open(self.user.profile_pic.name) as file:
+            self.assertNotIn(b'Camera maker', file.read())
+
+    def test_png_keeps_transparency(self):
+        original = Image.new('RGBA', (50, 50), (255, 0, 0, 128))
+        self.upload(data=self.encode(original, 'PNG'), file_name='avatar.png')
+        stored = self.stored_original()
+        self.assertEqual((stored.mode, stored.tobytes()), ('RGBA', original.tobytes()))
+        self.assertNotIn('exif', stored.info)
+
+    def test_unsupported_format_rejected(self):
+        buffer = BytesIO()
+        Image.new('RGB', (10, 10)).save(buffer, 'GIF')
+        picture = SimpleUploadedFile('avatar.gif', buffer.getvalue(), content_type='image/gif')
+        response = self.client.put(f'/accounts/user/update/{self.user.id}/', {'profile_pic': picture}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+    def test_oversized_picture_rejected(self):
+        with override_settings(PROFILE_PIC_MAX_SIZE=10):
+            buffer = BytesIO()
+            Image.new('RGB', (10, 10)).save(buffer, 'JPEG')
+            picture = SimpleUploadedFile('avatar.jpg', buffer.getvalue(), content_type='image/jpeg')
+            response = self.client.put(f'/accounts/user/update/{self.user.id}/', {'profile_pic': picture}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('MB', response.json()['profile_pic'][0])
+
+    def test_truncated_pictures_rejected(self):
+        jpeg = self.encode(Image.effect_noise((200, 200), 60).convert('RGB'), 'JPEG')
+        png = self.encode(Image.effect_noise((200, 200), 60), 'PNG')
+        for data, file_name in ((jpeg[:len(jpeg) // 2], 'avatar.jpg'), (png[:len(png) // 2], 'avatar.png')):
+            picture = SimpleUploadedFile(file_name, data, content_type='application/octet-stream')
+            response = self.client.put(f'/accounts/user/update/{self.user.id}/', {'profile_pic': picture}, format='multipart')
+            self.assertEqual(response.status_code, 400)
+
+    def test_unstrippable_original_removed(self):
+        data = self.encode(Image.effect_noise((200, 200), 60).convert('RGB'), 'JPEG')
+        name = default_storage.save('profile_pics/avatar.jpg', ContentFile(data[:len(data) // 2]))
+        User.objects.filter(pk=self.user.pk).update(profile_pic=name)
+        with self.assertLogs('accounts.images', 'WARNING'):
+            images.process_profile_pic(self.user.pk, name, {})
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.profile_pic.name, self.user.profile_pic_variants), ('', {}))
+        self.assertFalse(default_storage.exists(name))
+
+    @override_settings(PROFILE_PIC_WORKERS=1, PROFILE_PIC_QUEUE_SIZE=0)
+    def test_full_pool_defers_to_job_queue(self):
+        pool = images.ImagePool()
+        pool.get_executor()
+        # Every slot is taken: the task becomes a background job instead of blocking
+        pool.slots.acquire()
+        name = default_storage.save('profile_pics/avatar.jpg', ContentFile(self.encode(Image.new('RGB', (80, 80)), 'JPEG')))
+        User.objects.filter(pk=self.user.pk).update(profile_pic=name)
+        self.assertIsNone(pool.submit(images.process_profile_pic, self.user.pk, name, {}))
+        Worker().run_pending()
+        self.user.refresh_from_db()
+        self.assertEqual(set(self.user.profile_pic_variants), {'small', 'medium'})
+        pool.executor.shutdown()
+
+
+# Admin user list: cursor pages keyed on id, projected columns, filters and NDJSON export.
+class UserListTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='password', is_staff=True)
+        User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com', is_active=i % 3 != 0) for i in range(12)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_cursor_pages(self):
+        usernames = []
+        url = '/accounts/user/list/?limit=5'
+        while url:
+            with self.assertNumQueries(1):
+                data = self.client.get(url).json()
+            usernames += [user['username'] for user in data['results']]
+            url = data['next']
+        self.assertEqual(usernames, [f'user{i}' for i in range(12)])
+        self.assertEqual(set(data['results'][0]), {'id', 'username', 'email', 'date_joined', 'is_active'})
+
+    def test_filters(self):
+        data = self.client.get('/accounts/user/list/?is_active=false').json()
+        self.assertEqual([user['username'] for user in data['results']], ['user0', 'user3', 'user6', 'user9'])
+        self.assertEqual(self.client.get('/accounts/user/list/?joined_after=2000-01-01').json()['results'][0]['username'], 'user0')
+        self.assertEqual(self.client.get('/accounts/user/list/?joined_before=2000-01-01').json()['results'], [])
+        self.assertEqual(self.client.get('/accounts/user/list/?joined_after=yesterday').status_code, 400)
+
+    def test_ndjson_export(self):
+        response = self.client.get('/accounts/user/list/?stream=ndjson&is_active=true')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 8)
+        self.assertEqual(json.loads(lines[0])['username'], 'user1')
+
+    def test_admin_only(self):
+        self.client.force_authenticate(User.objects.get(username='user1'))
+        self.assertEqual(self.client.get('/accounts/user/list/').status_code, 403)
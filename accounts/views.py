@@ -1,13 +1,18 @@
 from django.shortcuts import render
 from rest_framework.views import APIView
-from .serializers import UserRegisterSerializer, UserLoginSerializer, UserSerializer
+from .serializers import UserRegisterSerializer, UserLoginSerializer, UserListSerializer, UserSerializer
+from .pagination import UserCursorPagination
 from .models import User
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, ValidationError
+from datetime import datetime, time
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from Blogging_Platform_Api.streaming import get_stream_format, stream
 from django.contrib.auth import logout
-from rest_framework.authentication import TokenAuthentication
+from .authentication import CachedTokenAuthentication, invalidate_token
 
 
 # Create your views here.
@@ -38,21 +43,56 @@ class UserLoginView(APIView):
 class UserListView(APIView):
     # Only accessible by admin users.
     permission_classes = [IsAdminUser]
+    pagination_class = UserCursorPagination
 
-    # Handles GET requests to list non-admin users.
+    # Handles GET requests to list non-admin users, one cursor page at a time ('?cursor=', '?limit=')
+    # or streamed as a whole ('?stream=ndjson' or '?stream=json').
+    # Filters: '?is_active=true|false', '?joined_after=' and '?joined_before=' (ISO date or datetime).
     def get(self, request):
-        # Excludes admin users and serializes the remaining users.
-        users = User.objects.exclude(is_staff=True)
-        serializer = UserRegisterSerializer(users, many=True)
+        # Excludes admin users and loads only the listed columns.
+        users = User.objects.exclude(is_staff=True).filter(**self.get_filters(request.query_params))
+        users = users.only(*UserListSerializer.Meta.fields)
+        stream_format = get_stream_format(request)
+        if stream_format:
+            return stream(users.order_by('id'), stream_format, UserListSerializer())
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(users, request, view=self)
+        serializer = UserListSerializer(page, many=True)
         # Returns serialized user data.
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
+
+    # Builds the ORM filters from the query parameters, rejecting invalid values.
+    def get_filters(self, query_params):
+        filters = {}
+        is_active = query_params.get('is_active')
+        if is_active is not None:
+            if is_active.lower() not in ('true', 'false', '1', '0'):
+                raise ValidationError({'is_active': 'Expected true or false.'})
+            filters['is_active'] = is_active.lower() in ('true', '1')
+        for param, lookup in (('joined_after', 'date_joined__gte'), ('joined_before', 'date_joined__lt')):
+            value = query_params.get(param)
+            if value is None:
+                continue
+            try:
+                parsed = parse_datetime(value) or parse_date(value)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                raise ValidationError({param: 'Expected an ISO 8601 date or datetime.'})
+            # Dates start at midnight, naive values are in the current time zone.
+            if not isinstance(parsed, datetime):
+                parsed = datetime.combine(parsed, time.min)
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            filters[lookup] = parsed
+        return filters
     
 # View to handle user update requests (PUT requests) for authenticated users.
 class UserUpdateView(APIView):
     # Only authenticated users can access this view.
     permission_classes = [IsAuthenticated]
     # Token authentication is required for accessing the view.
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     
     # Helper method to retrieve a user by ID, raises a NotFound error if the user doesn't exist.
     def get_object(self, user_id):
@@ -63,8 +103,9 @@ class UserUpdateView(APIView):
 
     # Handles PUT requests to update user data.
     def put(self, request, *args, **kwargs):
-        # Serialize the current user with the new data from the request (partial update allowed).
-        serializer = UserSerializer(request.user, data=request.data, partial=True)
+        # Serialize the current user, loaded fresh from the database, with the new data from the request
+        # (partial update allowed).
+        serializer = UserSerializer(self.get_object(request.user.pk), data=request.data, partial=True)
         # If the data is valid, save the updated user and return the serialized data.   
         if serializer.is_valid():
             serializer.save()
@@ -77,15 +118,13 @@ class UserLogoutView(APIView):
     # Only authenticated users can access this view.
     permission_classes = [IsAuthenticated]
     # Token authentication is required for accessing the view.
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     # Handles POST requests for logging out a user.
     def post(self, request, *args, **kwargs):
-        # Deletes the user's authentication token to log them out.
-        request.user.auth_token.delete()
-        # Save the user instance after logging out (optional step to refresh user state).
-        user = request.user
-        user.save()
+        # Drops the token from the authentication cache, then deletes it to log the user out.
+        invalidate_token(request.auth.key)
+        request.auth.delete()
         # Call Django's logout function to clear the session.
         logout(request)
         # Return a success message indicating successful logout.
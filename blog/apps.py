@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 
 
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        from . import caching, counters, search
+        blog = self.get_model('Blog')
+        post_delete.connect(search.remove_deleted_blog, sender=blog, dispatch_uid='blog.search.remove_deleted_blog')
+        for model in (get_user_model(), self.get_model('Tag')):
+            pre_save.connect(search.remember_rename, sender=model, dispatch_uid=f'blog.search.remember_rename.{model.__name__}')
+            post_save.connect(search.reindex_renamed, sender=model, dispatch_uid=f'blog.search.reindex_renamed.{model.__name__}')
+        pre_delete.connect(counters.remember_deleted_blog, sender=blog, dispatch_uid='blog.counters.remember_deleted_blog')
+        post_delete.connect(counters.uncount_deleted_blog, sender=blog, dispatch_uid='blog.counters.uncount_deleted_blog')
+        post_delete.connect(caching.invalidate_deleted_blog, sender=blog, dispatch_uid='blog.caching.invalidate_deleted_blog')
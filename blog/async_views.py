@@ -0,0 +1,105 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.request import Request
+from Blogging_Platform_Api import renderers
+from .models import Blog
+from .pagination import BlogPagination
+from .serializers import BlogSerializer, BlogValuesSerializer
+from .views import category_or_author
+from . import caching as blog_caching, search
+
+# Async (ASGI-native) variants of the read endpoints in views.py.
+# They run on the event loop and load blogs with the async ORM. Lists are read as values() rows and
+# rendered by BlogValuesSerializer (tag names fetched with one async query), the detail payload by
+# BlogSerializer once the blog and its tags are loaded, so serialization does no I/O. Responses are
+# encoded with renderers.dumps like the sync views, the detail and list payloads go through the blog
+# cache (blog.caching), and reads go to a replica like those of blog.views (READ_REPLICA_VIEW_MODULES).
+# They are public read endpoints and return the same payloads as their sync versions.
+
+
+def json_response(data, status=200):
+    return HttpResponse(renderers.dumps(data), status=status, content_type='application/json')
+
+
+# Renders a page of values() rows and returns the paginated payload.
+async def paginated_data(paginator, page, fields):
+    data = await BlogValuesSerializer(page, fields=fields).adata()
+    return paginator.get_paginated_response(data).data
+
+
+# AsyncBlogDetailView to retrieve a specific Blog, served from the cache when possible
+class AsyncBlogDetailView(View):
+    async def get(self, request, *args, **kwargs):
+        entry = await sync_to_async(blog_caching.get_detail)(kwargs['id'])
+        if entry is None:
+            try:
+                blog = await BlogSerializer.setup_eager_loading(Blog.objects.all()).aget(id=kwargs['id'])
+            except Blog.DoesNotExist:
+                return json_response({"detail": "Blog not found"}, status=404)
+            entry = await sync_to_async(blog_caching.set_detail)(blog, BlogSerializer(blog).data)
+        return blog_caching.cached_response(request, entry)
+
+
+# AsyncBlogListView to retrieve the paginated list of published blogs, served from the cache when possible
+class AsyncBlogListView(View):
+    pagination_class = BlogPagination
+    ordering_fields = ['Published_Date', 'Category']
+
+    async def get(self, request, *args, **kwargs):
+        # Wrap the request so the paginator can read query_params
+        drf_request = Request(request)
+        key, entry = await sync_to_async(self.get_cached)(request, drf_request)
+        # Not cached (and not a 304): build the page and cache it
+        if entry['body'] is None and blog_caching.not_modified(request, entry) is None:
+            entry = await sync_to_async(blog_caching.set_list)(key, entry, await self.list_blogs(drf_request))
+        return blog_caching.cached_response(request, entry)
+
+    # Cache key and entry of the requested page, looked up in one call: the cached entry, or an empty one
+    # carrying the ETag of the page.
+    @staticmethod
+    def get_cached(request, drf_request):
+        key, entry = blog_caching.list_page(drf_request, 'async/list')
+        if blog_caching.not_modified(request, entry) is None:
+            entry = blog_caching.get_list(key) or entry
+        return key, entry
+
+    async def list_blogs(self, request):
+        fields = BlogSerializer.get_requested_fields(request.query_params)
+        blogs = BlogValuesSerializer.get_queryset(Blog.objects.filter(Published_Date__isnull=False), fields)
+        # Apply ordering when it is one of the supported fields
+        sort_by = request.query_params.get('sort', '')
+        if sort_by.lstrip('-') in self.ordering_fields:
+            blogs = blogs.order_by(sort_by, 'id')
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(blogs, request, view=self)
+        return await paginated_data(paginator, page, fields)
+
+
+# AsyncSearchView to search blogs through the full-text index
+class AsyncSearchView(View):
+    pagination_class = BlogPagination
+
+    async def get(self, request, *args, **kwargs):
+        request = Request(request)
+        query = request.query_params.get('q', '')
+        fields = BlogSerializer.get_requested_fields(request.query_params)
+        blogs = search.search(query, BlogValuesSerializer.get_queryset(Blog.objects.all(), fields))
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(blogs, request, view=self)
+        return json_response(await paginated_data(paginator, page, fields))
+
+
+# AsyncBlogFilterView to filter blogs by category or author, paginated newest first
+class AsyncBlogFilterView(View):
+    pagination_class = BlogPagination
+
+    async def get(self, request, *args, **kwargs):
+        request = Request(request)
+        category = request.query_params.get('Category', '')
+        author = request.query_params.get('Author', '')
+        fields = BlogSerializer.get_requested_fields(request.query_params)
+        blogs = BlogValuesSerializer.get_queryset(Blog.objects.filter(category_or_author(category, author)), fields)
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(blogs.order_by('-id'), request, view=self)
+        return json_response(await paginated_data(paginator, page, fields))
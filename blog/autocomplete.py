@@ -0,0 +1,235 @@
+import bisect
+import heapq
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections, transaction
+from .models import Blog, Tag
+
+logger = logging.getLogger(__name__)
+
+# Prefix autocomplete of tag names and published blog titles, answered from memory without touching the database.
+# Each index is a list of (normalized text, id, text, score) entries sorted by normalized text, so the entries
+# starting with a prefix are one contiguous range found with two binary searches, and the best `limit` of the
+# range by score (tags: Tag.post_count, titles: publication time) are picked with a heap. Results of prefixes
+# matching many entries (one or two letters) are memoized until the index changes.
+# Indexes are per process: built on first use (not at import, so a pre-fork server's master neither loads them
+# nor opens a connection its workers would inherit), updated in place when BlogSerializer creates tags or
+# publishes, edits or deletes blogs (once the transaction commits), and rebuilt from the database every
+# AUTOCOMPLETE_REFRESH seconds, which picks up new popularity and the writes of other processes (other server
+# workers, import_blogs, background jobs). Rebuilds run in a background thread, one
+# at a time, while requests keep reading the current index; the new one replaces it when it is complete.
+
+INDEXES = ('tags', 'titles')
+
+# Prefixes matching more entries than this have their results memoized.
+MEMO_THRESHOLD = 256
+
+# Sorts after any character a prefix can be followed by.
+LAST_CHARACTER = '\U0010ffff'
+
+
+def normalize(text):
+    return ' '.join(text.split()).casefold()
+
+
+# Sorted prefix index of (text, id, score) entries.
+class PrefixIndex:
+    def __init__(self, entries=()):
+        self.rows = sorted((normalize(text), ident, text, score) for text, ident, score in entries)
+        self.keys = [row[0] for row in self.rows]
+        self.memo = {}
+        self.lock = threading.Lock()
+        self.built = time.monotonic()
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Position of the entry of `ident` with the normalized text `key`, or None.
+    def find(self, key, ident):
+        position = bisect.bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.rows[position][1] == ident:
+                return position
+            position += 1
+        return None
+
+    # Adds an entry, or with `replace` updates the text and score of an existing one.
+    def add(self, text, ident, score, replace=True):
+        key = normalize(text)
+        with self.lock:
+            position = self.find(key, ident)
+            if position is None:
+                position = bisect.bisect_left(self.rows, (key, ident))
+                self.rows.insert(position, (key, ident, text, score))
+                self.keys.insert(position, key)
+            elif replace:
+                self.rows[position] = (key, ident, text, score)
+            else:
+                return
+            self.memo.clear()
+
+    def remove(self, text, ident):
+        key = normalize(text)
+        with self.lock:
+            position = self.find(key, ident)
+            if position is not None:
+                del self.rows[position]
+                del self.keys[position]
+                self.memo.clear()
+
+    # Best `limit` entries starting with the prefix, as (id, text, score) tuples, highest score first
+    # (ties in alphabetical order).
+    def complete(self, prefix, limit):
+        # A trailing space is kept, so 'web ' completes to 'web design' but not to 'webassembly'.
+        prefix = normalize(prefix) + (' ' if prefix[-1:].isspace() and prefix.strip() else '')
+        with self.lock:
+            best = self.memo.get((prefix, limit))
+            if best is not None:
+                return best
+            start = bisect.bisect_left(self.keys, prefix)
+            end = bisect.bisect_left(self.keys, prefix + LAST_CHARACTER, start)
+            rows = map(self.rows.__getitem__, range(start, end))
+            best = [(ident, text, score) for _, ident, text, score in heapq.nlargest(limit, rows, key=lambda row: row[3])]
+            if end - start > MEMO_THRESHOLD:
+                self.memo[prefix, limit] = best
+        return best
+
+
+def get_refresh():
+    return getattr(settings, 'AUTOCOMPLETE_REFRESH', 300)
+
+
+def titles_enabled():
+    return getattr(settings, 'AUTOCOMPLETE_TITLES', True)
+
+
+def load_tags():
+    return Tag.objects.values_list('name', 'id', 'post_count').iterator(chunk_size=10000)
+
+
+# The latest AUTOCOMPLETE_MAX_TITLES published blogs, scored by publication time.
+def load_titles():
+    if not titles_enabled():
+        return []
+    blogs = (Blog.objects.filter(Published_Date__isnull=False).order_by('-Published_Date')
+             .values_list('Title', 'id', 'Published_Date')[:getattr(settings, 'AUTOCOMPLETE_MAX_TITLES', 100000)])
+    return ((title, blog_id, published.timestamp()) for title, blog_id, published in blogs.iterator(chunk_size=10000))
+
+
+LOADERS = {'tags': load_tags, 'titles': load_titles}
+
+indexes = {}
+# Updates committed while an index is being built ({name: [update]}), applied to the new index before it
+# replaces the current one (updates are idempotent, so those the load already saw do no harm).
+pending = {}
+# Guards `indexes` and `pending`.
+state_lock = threading.Lock()
+# Held while an index is being built: one build at a time.
+build_lock = threading.Lock()
+
+
+# Loads an index from the database and makes it the current one. The caller holds build_lock.
+def build(name):
+    with state_lock:
+        pending[name] = []
+    try:
+        index = PrefixIndex(LOADERS[name]())
+    except BaseException:
+        with state_lock:
+            pending.pop(name, None)
+        raise
+    with state_lock:
+        for update in pending.pop(name):
+            update(index)
+        indexes[name] = index
+    return index
+
+
+# Background thread: rebuilds an index, then releases build_lock. After a failure the current index is
+# kept for another AUTOCOMPLETE_REFRESH seconds.
+def rebuild(name):
+    close_old_connections()
+    try:
+        build(name)
+    except Exception:
+        logger.exception('Rebuilding the %s autocomplete index failed', name)
+        indexes[name].built = time.monotonic()
+    finally:
+        build_lock.release()
+        connections.close_all()
+
+
+def start_rebuild(name):
+    threading.Thread(target=rebuild, args=(name,), name=f'autocomplete-{name}', daemon=True).start()
+
+
+# Returns the current index. It is built on first use; once older than AUTOCOMPLETE_REFRESH seconds, it is
+# still returned while a background thread builds the next one (unless a build is already running).
+def get_index(name):
+    index = indexes.get(name)
+    if index is None:
+        with build_lock:
+            index = indexes.get(name)
+            if index is None:
+                index = build(name)
+    elif time.monotonic() - index.built > get_refresh() and build_lock.acquire(blocking=False):
+        start_rebuild(name)
+    return index
+
+
+# Builds every index now, e.g. from a server's post-fork hook. A database that is not migrated yet is skipped
+# (the indexes are built on first use).
+def warm_up():
+    try:
+        with build_lock:
+            for name in INDEXES:
+                build(name)
+    except DatabaseError:
+        indexes.clear()
+
+
+# Best completions of a prefix: tags as {'name', 'post_count'}, titles as {'id', 'Title'}.
+def complete(name, prefix, limit):
+    if name == 'titles':
+        return [{'id': ident, 'Title': text} for ident, text, _ in get_index(name).complete(prefix, limit)]
+    return [{'name': text, 'post_count': score} for _, text, score in get_index(name).complete(prefix, limit)]
+
+
+# Runs `update` on an index once the current transaction commits. Indexes not built yet are left alone:
+# they load the change with everything else.
+def on_commit(name, update):
+    def apply():
+        with state_lock:
+            index = indexes.get(name)
+            if name in pending:
+                pending[name].append(update)
+        if index is not None:
+            update(index)
+    transaction.on_commit(apply)
+
+
+# Adds tags (Tag objects or (name, id) pairs) to the tag index. Tags already indexed keep their popularity.
+def add_tags(tags):
+    tags = [(tag.name, tag.id) if isinstance(tag, Tag) else tuple(tag) for tag in tags]
+
+    def update(index):
+        for name, tag_id in tags:
+            index.add(name, tag_id, 0, replace=False)
+    on_commit('tags', update)
+
+
+# Updates the title index: removes the (title, blog id) entries of `removed`, then indexes the published blogs.
+def update_titles(blogs, removed=()):
+    if not titles_enabled():
+        return
+    added = [(blog.Title, blog.id, blog.Published_Date.timestamp()) for blog in blogs if blog.Published_Date is not None]
+    removed = list(removed)
+
+    def update(index):
+        for title, blog_id in removed:
+            index.remove(title, blog_id)
+        for title, blog_id, score in added:
+            index.add(title, blog_id, score)
+    on_commit('titles', update)
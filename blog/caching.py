@@ -0,0 +1,135 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+from Blogging_Platform_Api import renderers
+from Blogging_Platform_Api.db import read_replica
+from Blogging_Platform_Api.compression import precompress
+
+# Cache keys used for serialized blog payloads.
+DETAIL_KEY = 'blog:detail:{}'
+LIST_KEY = 'blog:list:{}:{}'
+LIST_VERSION_KEY = 'blog:list:version'
+
+
+# Returns the cache configured for blog payloads (BLOG_CACHE_ALIAS, the 'default' cache if not set).
+def get_cache():
+    return caches[getattr(settings, 'BLOG_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'BLOG_CACHE_TIMEOUT', 300)
+
+
+# Version of the cached list pages: the time (in milliseconds) of the last write touching a blog.
+# Every list page key contains it, so bumping it invalidates all cached pages at once.
+def get_list_version():
+    cache = get_cache()
+    version = cache.get(LIST_VERSION_KEY)
+    if version is None:
+        version = int(time.time() * 1000)
+        # Another process may have set the version first, in which case that one wins.
+        if not cache.add(LIST_VERSION_KEY, version, None):
+            version = cache.get(LIST_VERSION_KEY) or version
+    return version
+
+
+# Drops the cached payloads a write to the blog affects: its detail entry and every list page.
+def invalidate_blog(blog_id):
+    invalidate_blogs([blog_id])
+
+
+def invalidate_blogs(blog_ids):
+    cache = get_cache()
+    cache.delete_many([DETAIL_KEY.format(blog_id) for blog_id in blog_ids])
+    version = max(int(time.time() * 1000), (cache.get(LIST_VERSION_KEY) or 0) + 1)
+    cache.set(LIST_VERSION_KEY, version, None)
+
+
+# post_delete receiver for Blog (connected in BlogConfig.ready): drops the cached payloads of every deleted
+# blog once the deletion commits, including the blogs deleted by a cascade from their author.
+def invalidate_deleted_blog(sender, instance, **kwargs):
+    blog_id = instance.pk
+    transaction.on_commit(lambda: invalidate_blog(blog_id))
+
+
+# Whether a payload read by the current request may be stored. Replicas may lag behind the last write, so
+# payloads read from a replica are not stored during READ_REPLICA_STICKY_SECONDS after it (the list version
+# is its time): the writer, pinned to the primary for that long, would otherwise be served them from the cache.
+def can_store():
+    if read_replica.get() is None:
+        return True
+    last_write = get_cache().get(LIST_VERSION_KEY)
+    window = getattr(settings, 'READ_REPLICA_STICKY_SECONDS', 10) * 1000
+    return last_write is None or time.time() * 1000 - last_write >= window
+
+
+# Cache entry of a payload: its JSON rendering, compressed once with every available encoding
+# (served as is by CompressionMiddleware), and the ETag and Last-Modified of its version.
+def make_entry(data, etag, last_modified):
+    body = None if data is None else renderers.dumps(data)
+    encoded = precompress(body) if body is not None else {}
+    return {'body': body, 'encoded': encoded, 'etag': etag, 'last_modified': last_modified}
+
+
+# Cached detail payload of a blog, or None.
+def get_detail(blog_id):
+    return get_cache().get(DETAIL_KEY.format(blog_id))
+
+
+# Stores the detail payload of a blog (see can_store) and returns its entry.
+# The ETag and Last-Modified come from the blog's Updated_Date.
+def set_detail(blog, data):
+    updated = blog.Updated_Date.timestamp()
+    entry = make_entry(data, '"blog-%s-%d"' % (blog.id, updated * 1000000), updated)
+    if can_store():
+        get_cache().set(DETAIL_KEY.format(blog.id), entry, get_timeout())
+    return entry
+
+
+# Returns the cache key of a list page and an empty entry carrying its ETag and Last-Modified.
+# Pages are keyed by the list version and the sorted query string.
+def list_page(request, name):
+    version = get_list_version()
+    query = sorted(request.query_params.lists())
+    digest = hashlib.md5(f'{name}:{query}'.encode()).hexdigest()
+    key = LIST_KEY.format(version, digest)
+    return key, make_entry(None, '"%s-%s-%s"' % (name, version, digest), version / 1000)
+
+
+def get_list(key):
+    return get_cache().get(key)
+
+
+# Stores a list page (see can_store) and returns its entry.
+def set_list(key, entry, data):
+    entry = make_entry(data, entry['etag'], entry['last_modified'])
+    if can_store():
+        get_cache().set(key, entry, get_timeout())
+    return entry
+
+
+# Returns a 304 response when the client already holds this version, None otherwise.
+def not_modified(request, entry):
+    return get_conditional_response(request, etag=entry['etag'], last_modified=int(entry['last_modified']))
+
+
+# Builds the response for a cached entry, answering conditional requests with a 304.
+# JSON clients get the stored rendering (and its compressed versions), other renderers
+# (e.g. the browsable API) render the payload again.
+def cached_response(request, entry):
+    response = not_modified(request, entry)
+    if response is None:
+        if getattr(request, 'accepted_renderer', None) is None or request.accepted_renderer.format == 'json':
+            response = HttpResponse(entry['body'], content_type='application/json')
+            response.precompressed = entry['encoded']
+        else:
+            response = Response(renderers.loads(entry['body']), status=200)
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    return response
@@ -0,0 +1,92 @@
+from collections import Counter
+from django.db.models import Case, Count, F, Value, When
+from django.db.models.functions import Greatest
+from .models import Blog
+
+# Denormalized counts of published blogs per category and per tag (Category.post_count, Tag.post_count).
+# Writers take the counted state of a blog before changing it and record the change afterwards, in the
+# same transaction, so the counters are committed together with the data they count.
+# Deleted blogs are uncounted by the pre_delete/post_delete receivers below (connected in BlogConfig.ready),
+# so blogs deleted by a cascade from their author are uncounted too.
+# `reconcile` recomputes them from the blogs (see the reconcile_counters command).
+
+
+# Counted state of a blog: its category id and tag ids if it is published, None otherwise.
+def counted_state(blog):
+    if blog is None or blog.pk is None or blog.Published_Date is None:
+        return None
+    return blog.Category_id, frozenset(blog.tags.values_list('id', flat=True))
+
+
+# Adds +1/-1 per category and tag for each (before, after) pair of counted states and writes the
+# differences with one UPDATE per model (F() expressions, safe under concurrent writers).
+def record_changes(changes):
+    categories, tags = Counter(), Counter()
+    for before, after in changes:
+        for state, delta in ((before, -1), (after, 1)):
+            if state is None:
+                continue
+            category_id, tag_ids = state
+            categories[category_id] += delta
+            for tag_id in tag_ids:
+                tags[tag_id] += delta
+    update_counts(Blog._meta.get_field('Category').related_model, categories)
+    update_counts(Blog._meta.get_field('tags').related_model, tags)
+
+
+def record_change(before, after):
+    record_changes([(before, after)])
+
+
+# pre_delete receiver for Blog: remembers the counted state of the blog while its tags are still linked
+# (the blog/tag rows are deleted before the blog).
+def remember_deleted_blog(sender, instance, **kwargs):
+    instance._counted_state = counted_state(instance)
+
+
+# post_delete receiver for Blog: uncounts the deleted blog from its category and tags.
+def uncount_deleted_blog(sender, instance, **kwargs):
+    record_change(getattr(instance, '_counted_state', None), None)
+
+
+def update_counts(model, deltas):
+    ids_by_delta = {}
+    for pk, delta in deltas.items():
+        if delta:
+            ids_by_delta.setdefault(delta, []).append(pk)
+    if not ids_by_delta:
+        return
+    increment = Case(*[When(pk__in=ids, then=Value(delta)) for delta, ids in ids_by_delta.items()], default=Value(0))
+    # Never below zero: a counter that drifted low must not make the write fail (reconcile fixes it).
+    model.objects.filter(pk__in=[pk for ids in ids_by_delta.values() for pk in ids]).update(
+        post_count=Greatest(F('post_count') + increment, Value(0))
+    )
+
+
+# Recomputes every counter from the published blogs with one GROUP BY per model and writes only the
+# counters that drifted. Takes the Blog model to work on (historical models in migrations).
+# Returns the number of corrected categories and tags.
+def reconcile(blog_model=Blog):
+    published = blog_model.objects.filter(Published_Date__isnull=False)
+    category_model = blog_model._meta.get_field('Category').related_model
+    tag_model = blog_model._meta.get_field('tags').related_model
+    through = blog_model._meta.get_field('tags').remote_field.through
+    category_counts = dict(
+        published.order_by().values_list('Category').annotate(count=Count('id')).values_list('Category', 'count')
+    )
+    tag_counts = dict(
+        through.objects.filter(blog__in=published.values('id')).order_by()
+        .values_list('tag').annotate(count=Count('blog')).values_list('tag', 'count')
+    )
+    return fix_counts(category_model, category_counts), fix_counts(tag_model, tag_counts)
+
+
+def fix_counts(model, counts):
+    drifted = []
+    for row in model.objects.only('id', 'post_count').iterator(chunk_size=1000):
+        count = counts.get(row.id, 0)
+        if row.post_count != count:
+            row.post_count = count
+            drifted.append(row)
+    model.objects.bulk_update(drifted, ['post_count'], batch_size=1000)
+    return len(drifted)
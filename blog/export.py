@@ -0,0 +1,96 @@
+import csv
+import io
+from datetime import date
+from Blogging_Platform_Api.compression import compress_stream
+from Blogging_Platform_Api.renderers import dumps
+from .models import Blog
+
+# Full exports of the blogs for analytics, as gzip-compressed NDJSON or CSV.
+# Blogs are read in id order through a single database cursor (QuerySet.iterator(), server-side where the
+# backend supports it) as plain rows joined with their category and author, and the
+# tags of each batch of rows are read with one query on the id range of the batch. Every batch is encoded
+# and compressed before the next one is read, so memory does not grow with the number of blogs.
+
+# Exported columns, in CSV order. Tags are joined with TAG_SEPARATOR in CSV.
+COLUMNS = ['id', 'Title', 'Excerpt', 'Content', 'Category', 'Author', 'tags', 'Created_Date', 'Published_Date', 'Updated_Date']
+TAG_SEPARATOR = '|'
+
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+# Number of blogs read, encoded and compressed at a time.
+BATCH_SIZE = 2000
+
+
+# Returns {blog id: [tag names]} for the blogs with an id between first_id and last_id.
+def get_tags(first_id, last_id):
+    tags = {}
+    links = Blog.tags.through.objects.filter(blog_id__gte=first_id, blog_id__lte=last_id).order_by()
+    for blog_id, name in links.values_list('blog_id', 'tag__name'):
+        tags.setdefault(blog_id, []).append(name)
+    return tags
+
+
+# Yields the blogs as lists of dicts (one list per batch), in id order.
+def export_batches(blogs=None, batch_size=BATCH_SIZE):
+    blogs = Blog.objects.all() if blogs is None else blogs
+    rows = blogs.order_by('id').values_list(
+        'id', 'Title', 'Excerpt', 'Content', 'Category__name', 'Author__username',
+        'Created_Date', 'Published_Date', 'Updated_Date',
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield make_records(batch)
+            batch = []
+    if batch:
+        yield make_records(batch)
+
+
+def make_records(batch):
+    tags = get_tags(batch[0][0], batch[-1][0])
+    return [
+        {
+            'id': blog_id, 'Title': title, 'Excerpt': excerpt, 'Content': content,
+            'Category': category, 'Author': author, 'tags': tags.get(blog_id, []),
+            'Created_Date': created, 'Published_Date': published, 'Updated_Date': updated,
+        }
+        for blog_id, title, excerpt, content, category, author, created, published, updated in batch
+    ]
+
+
+def encode_ndjson(records):
+    return b''.join(dumps(record) + b'\n' for record in records)
+
+
+def encode_csv(records, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(COLUMNS)
+    for record in records:
+        writer.writerow([
+            TAG_SEPARATOR.join(value) if name == 'tags'
+            else value.isoformat() if isinstance(value, date)
+            else value
+            for name, value in record.items()
+        ])
+    return buffer.getvalue().encode()
+
+
+# Yields the uncompressed export, one chunk per batch. CSV exports start with a header row.
+def generate(export_format, blogs=None, batch_size=BATCH_SIZE):
+    if export_format == 'csv':
+        yield encode_csv([], header=True)
+    for records in export_batches(blogs, batch_size):
+        yield encode_csv(records) if export_format == 'csv' else encode_ndjson(records)
+
+
+# Yields the gzip-compressed export.
+def generate_gzip(export_format, blogs=None, batch_size=BATCH_SIZE):
+    return compress_stream(generate(export_format, blogs, batch_size), 'gzip')
+
+
+# File name of an export made today, e.g. blogs-2024-05-01.ndjson.gz (blogs-2024-05-01.ndjson uncompressed)
+def file_name(export_format, compressed=True):
+    return f'blogs-{date.today().isoformat()}.{export_format}' + ('.gz' if compressed else '')
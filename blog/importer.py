@@ -0,0 +1,207 @@
+import csv
+import gzip
+import io
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from accounts.models import User
+from Blogging_Platform_Api.renderers import loads
+from .export import TAG_SEPARATOR
+from .models import Blog, Category, Tag, bulk_insert_blogs, make_excerpt
+from . import caching, counters, search
+
+# Bulk import of blogs from JSON lines or CSV files (the import_blogs command), e.g. when migrating from
+# another platform. Input is read as a stream and parsed in chunks, optionally by worker processes; authors,
+# categories and tags are resolved through in-memory maps loaded once, and each chunk is inserted in its own
+# transaction with bulk inserts, together with its counters and search index entries.
+# Both formats use the columns of the export (blog.export): Title, Content, Category (name), Author
+# (username), tags (list, or TAG_SEPARATOR separated in CSV) and Published_Date (ISO 8601, empty for drafts).
+
+IMPORT_FORMATS = ('jsonl', 'csv')
+
+# A validated input record and its line number in the input. The excerpt is computed while parsing, so it is
+# done by the worker processes too.
+Record = namedtuple('Record', ['line', 'title', 'content', 'excerpt', 'category', 'author', 'tags', 'published'])
+
+
+# Yields (line number, raw record) pairs from a file: JSON lines as strings, CSV rows as dicts.
+def read_raw(file, input_format):
+    if input_format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(file, 1):
+            if line.strip():
+                yield line_number, line
+
+
+# Opens an input file as text, decompressing .gz files.
+def open_input(path):
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+# Returns the input format of a file from its name (.csv, .csv.gz, anything else is JSON lines).
+def guess_format(path):
+    return 'csv' if path.removesuffix('.gz').endswith('.csv') else 'jsonl'
+
+
+def required(record, name, max_length=None):
+    value = record.get(name)
+    value = value.strip() if isinstance(value, str) else value
+    if not value:
+        raise ValueError(f'{name} is required.')
+    if not isinstance(value, str):
+        raise ValueError(f'{name} must be a string.')
+    if max_length and len(value) > max_length:
+        raise ValueError(f'{name} is longer than {max_length} characters.')
+    return value
+
+
+# Validates one raw record, returns a Record.
+def parse_record(line_number, raw, input_format):
+    record = raw if input_format == 'csv' else loads(raw)
+    if not isinstance(record, dict):
+        raise ValueError('Expected an object.')
+    tags = record.get('tags') or []
+    if isinstance(tags, str):
+        tags = tags.split(TAG_SEPARATOR)
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise ValueError('tags must be a list of names.')
+    tags = tuple(dict.fromkeys(tag.strip() for tag in tags if tag.strip()))
+    if any(len(tag) > 255 for tag in tags):
+        raise ValueError('Tag names are limited to 255 characters.')
+    published = record.get('Published_Date') or None
+    if published is not None:
+        try:
+            published = parse_datetime(published) if isinstance(published, str) else None
+        except ValueError:
+            published = None
+        if published is None:
+            raise ValueError('Published_Date must be an ISO 8601 datetime.')
+        if timezone.is_naive(published):
+            published = timezone.make_aware(published)
+    content = required(record, 'Content')
+    return Record(
+        line_number,
+        required(record, 'Title', 255),
+        content,
+        make_excerpt(content),
+        required(record, 'Category', 30),
+        required(record, 'Author', 150),
+        tags,
+        published,
+    )
+
+
+# Parses a chunk of (line number, raw record) pairs. Returns the valid records and the
+# (line number, error) pairs of the invalid ones. Runs in the worker processes.
+def parse_chunk(chunk, input_format):
+    records, errors = [], []
+    for line_number, raw in chunk:
+        try:
+            records.append(parse_record(line_number, raw, input_format))
+        except ValueError as exc:
+            errors.append((line_number, str(exc)))
+    return records, errors
+
+
+def split(raw_records, chunk_size):
+    chunk = []
+    for item in raw_records:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Yields the parsed chunks of the raw records, in input order. With workers, chunks are parsed by that many
+# processes, with at most two chunks per worker read ahead so memory stays bounded.
+def parse_chunks(raw_records, input_format, chunk_size, workers=0):
+    chunks = split(raw_records, chunk_size)
+    if workers < 2:
+        for chunk in chunks:
+            yield parse_chunk(chunk, input_format)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(parse_chunk, chunk, input_format))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# Inserts parsed records. Authors, categories and tags are looked up in maps loaded once;
+# missing categories and tags are created, records of unknown authors are skipped.
+class Importer:
+    def __init__(self, batch_size=1000, index=True):
+        self.batch_size = batch_size
+        self.index = index
+        self.authors = dict(User.objects.values_list('username', 'id'))
+        # The oldest category wins when several have the same name.
+        self.categories = dict(Category.objects.order_by('-id').values_list('name', 'id'))
+        self.tags = dict(Tag.objects.values_list('name', 'id'))
+        self.imported = 0
+
+    # Creates the categories and tags of the records that are not in the maps yet.
+    def add_missing(self, records):
+        categories = {record.category for record in records} - self.categories.keys()
+        if categories:
+            Category.objects.bulk_create([Category(name=name) for name in categories])
+            self.categories.update(Category.objects.filter(name__in=categories).order_by('-id').values_list('name', 'id'))
+        tags = {tag for record in records for tag in record.tags} - self.tags.keys()
+        if tags:
+            Tag.objects.bulk_create([Tag(name=name) for name in tags], ignore_conflicts=True)
+            self.tags.update(Tag.objects.filter(name__in=tags).values_list('name', 'id'))
+
+    # Inserts a chunk of records in one transaction. Returns the (line number, error) pairs of the skipped ones.
+    def insert(self, records):
+        known = [record for record in records if record.author in self.authors]
+        errors = [(record.line, f'Unknown author {record.author!r}.') for record in records if record.author not in self.authors]
+        with transaction.atomic():
+            self.add_missing(known)
+            blogs = [
+                Blog(
+                    Title=record.title,
+                    Content=record.content,
+                    Excerpt=record.excerpt,
+                    Author_id=self.authors[record.author],
+                    Category_id=self.categories[record.category],
+                    Published_Date=record.published,
+                )
+                for record in known
+            ]
+            bulk_insert_blogs(blogs, self.batch_size)
+            Blog.tags.through.objects.bulk_create(
+                [
+                    Blog.tags.through(blog_id=blog.id, tag_id=self.tags[tag])
+                    for blog, record in zip(blogs, known)
+                    for tag in record.tags
+                ],
+                batch_size=self.batch_size,
+            )
+            counters.record_changes(
+                (None, (blog.Category_id, frozenset(self.tags[tag] for tag in record.tags)))
+                for blog, record in zip(blogs, known)
+                if blog.Published_Date is not None
+            )
+            if self.index:
+                search.index_documents(
+                    (blog.id, [blog.Title, blog.Content, ' '.join(record.tags), record.author])
+                    for blog, record in zip(blogs, known)
+                )
+        self.imported += len(blogs)
+        return errors
+
+    # Drops the cached blog list pages once the import is done.
+    def finish(self):
+        caching.invalidate_blogs([])
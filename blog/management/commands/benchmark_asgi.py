@@ -0,0 +1,117 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+# Pairs of sync and async endpoints compared by default.
+DEFAULT_PATHS = [
+    ('/blog/detail/{id}/', '/blog/async/detail/{id}/'),
+    ('/blog/list/?limit=20', '/blog/async/list/?limit=20'),
+    ('/blog/search/?q=post&limit=20', '/blog/async/search/?q=post&limit=20'),
+    ('/blog/filter/?Category={category}', '/blog/async/filter/?Category={category}'),
+]
+
+
+# Management command comparing the sync and async read endpoints under ASGI.
+# Requests are sent straight to the project's ASGI application (no network or server in between),
+# `concurrency` at a time, and throughput and latency percentiles are reported per endpoint.
+class Command(BaseCommand):
+    help = 'Benchmarks sync vs async read endpoints under ASGI (requests/sec and p99 latency).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=200, help='Requests in flight at once.')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Endpoint to benchmark (repeatable), replaces the default sync/async pairs.')
+        parser.add_argument('--cache', action='store_true',
+                            help='Keep the blog response cache on (by default it is bypassed for a fair comparison).')
+
+    def handle(self, *args, **options):
+        from django.core.asgi import get_asgi_application
+        from blog.models import Blog
+
+        blog = Blog.objects.select_related('Category').order_by('id').first()
+        if blog is None:
+            raise CommandError('The database has no blogs to benchmark against.')
+        paths = options['paths'] or [path for pair in DEFAULT_PATHS for path in pair]
+        paths = [path.format(id=blog.id, category=blog.Category.name) for path in paths]
+
+        if not options['cache']:
+            # Route blog payload caching to a dummy cache so every request reaches the view.
+            caches = {**settings.CACHES, 'benchmark': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+            override = override_settings(CACHES=caches, BLOG_CACHE_ALIAS='benchmark')
+            override.enable()
+        application = get_asgi_application()
+        self.stdout.write(f"{'endpoint':<45} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+        for path in paths:
+            rate, p50, p99, errors = asyncio.run(
+                self.run(application, path, options['requests'], options['concurrency'])
+            )
+            self.stdout.write(f'{path:<45} {rate:>10.1f} {p50:>10.2f} {p99:>10.2f} {errors:>8}')
+
+    async def run(self, application, path, total, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                status = await self.request(application, path)
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    errors += 1
+
+        # Warm up connections and caches before measuring.
+        await self.request(application, path)
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+        return total / elapsed, p50, p99, errors
+
+    # Sends one GET request through the ASGI protocol and returns the response status.
+    async def request(self, application, path):
+        url = urlsplit(path)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url.path,
+            'raw_path': url.path.encode(),
+            'query_string': url.query.encode(),
+            'root_path': '',
+            'headers': [(b'host', b'localhost')],
+            'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+        done = asyncio.Event()
+        sent_body = False
+        status = None
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                done.set()
+
+        await application(scope, receive, send)
+        done.set()
+        return status
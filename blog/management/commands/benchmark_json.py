@@ -0,0 +1,63 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import json
+from Blogging_Platform_Api import renderers
+from blog.models import Blog
+from blog.serializers import BlogSerializer, BlogValuesSerializer
+
+
+# Management command comparing DRF's JSONRenderer and JSONParser with the fast ones (Blogging_Platform_Api.renderers)
+# on blog list pages, as returned by the list views. For each page size it reports the time to encode the page
+# with DRF, with the stdlib fallback and with orjson (when installed), and to decode it, and checks that
+# all encoders produce the same JSON.
+class Command(BaseCommand):
+    help = 'Benchmarks JSON encoding and decoding of blog list pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000], help='Page sizes.')
+        parser.add_argument('--repeat', type=int, default=50, help='Runs per page size, the best one is reported.')
+        parser.add_argument('--fields', default='', help="Comma separated fields, as in '?fields='.")
+
+    def handle(self, *args, **options):
+        fields = BlogSerializer.get_requested_fields({'fields': options['fields']})
+        blogs = Blog.objects.filter(Published_Date__isnull=False).order_by('-Published_Date', '-id')
+        if not blogs.exists():
+            raise CommandError('The database has no published blogs to benchmark against.')
+        if renderers.orjson is None:
+            self.stdout.write('orjson is not installed, only the stdlib fallback is measured.')
+
+        drf_renderer = JSONRenderer()
+        encoders = {'drf': drf_renderer.render, 'stdlib': renderers.stdlib_dumps}
+        decoders = {'drf': json.loads, 'stdlib': renderers.stdlib_loads}
+        if renderers.orjson is not None:
+            encoders['orjson'] = renderers.orjson_dumps
+            decoders['orjson'] = renderers.orjson.loads
+
+        header = ' '.join(f'{name + " enc ms":>14}' for name in encoders)
+        header += ' ' + ' '.join(f'{name + " dec ms":>14}' for name in decoders)
+        self.stdout.write(f"{'size':>6} {'bytes':>9} {header} {'enc x':>6} {'dec x':>6}")
+        for size in options['sizes']:
+            rows = list(BlogValuesSerializer.get_queryset(blogs, fields)[:size])
+            page = {'next': None, 'previous': None, 'results': BlogValuesSerializer(rows, fields=fields).data}
+            body = drf_renderer.render(page)
+            if any(encode(page) != body for encode in encoders.values()):
+                raise CommandError(f'Encoders disagree for page size {size}.')
+
+            encoding = {name: self.best(encode, page, options['repeat']) for name, encode in encoders.items()}
+            decoding = {name: self.best(decode, body, options['repeat']) for name, decode in decoders.items()}
+            fastest = list(encoders)[-1]
+            timings = ' '.join(f'{timing * 1000:>14.3f}' for timing in [*encoding.values(), *decoding.values()])
+            self.stdout.write(
+                f'{size:>6} {len(body):>9} {timings} '
+                f"{encoding['drf'] / encoding[fastest]:>5.1f}x {decoding['drf'] / decoding[fastest]:>5.1f}x"
+            )
+
+    # Best wall time of `repeat` runs.
+    def best(self, function, argument, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function(argument)
+            timings.append(time.perf_counter() - started)
+        return min(timings)
@@ -0,0 +1,47 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from blog.models import Blog
+from blog.serializers import BlogSerializer, BlogValuesSerializer
+
+
+# Management command comparing BlogSerializer with the values() fast path (BlogValuesSerializer)
+# on pages of published blogs. For each page size it reports the time to fetch and serialize a page,
+# and checks that both produce the same output.
+class Command(BaseCommand):
+    help = 'Benchmarks BlogSerializer vs BlogValuesSerializer on blog list pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000], help='Page sizes.')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per page size, the best one is reported.')
+        parser.add_argument('--fields', default='', help="Comma separated fields, as in '?fields='.")
+
+    def handle(self, *args, **options):
+        fields = BlogSerializer.get_requested_fields({'fields': options['fields']})
+        blogs = Blog.objects.filter(Published_Date__isnull=False).order_by('-Published_Date', '-id')
+        if not blogs.exists():
+            raise CommandError('The database has no published blogs to benchmark against.')
+
+        def with_serializer(size):
+            page = list(BlogSerializer.setup_eager_loading(blogs, fields)[:size])
+            return BlogSerializer(page, many=True, fields=fields).data
+
+        def with_values(size):
+            page = list(BlogValuesSerializer.get_queryset(blogs, fields)[:size])
+            return BlogValuesSerializer(page, fields=fields).data
+
+        self.stdout.write(f"{'size':>6} {'serializer ms':>14} {'values ms':>10} {'speedup':>8}")
+        for size in options['sizes']:
+            if list(with_serializer(size)) != with_values(size):
+                raise CommandError(f'Outputs differ for page size {size}.')
+            slow = self.best(with_serializer, size, options['repeat'])
+            fast = self.best(with_values, size, options['repeat'])
+            self.stdout.write(f'{size:>6} {slow * 1000:>14.2f} {fast * 1000:>10.2f} {slow / fast:>7.1f}x')
+
+    # Best wall time of `repeat` runs.
+    def best(self, function, size, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function(size)
+            timings.append(time.perf_counter() - started)
+        return min(timings)
@@ -0,0 +1,38 @@
+import sys
+import time
+from django.core.management.base import BaseCommand
+from blog import export
+
+
+# Management command writing every blog with its category, author and tags to a gzip-compressed
+# NDJSON or CSV file (the same export as /blog/export/), in constant memory.
+class Command(BaseCommand):
+    help = 'Exports all blogs as gzip-compressed NDJSON or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=list(export.EXPORT_FORMATS), default='ndjson', help='Export format.')
+        parser.add_argument('--output', help="Output file, '-' for stdout (default: blogs-<date>.<type>.gz, without .gz with --no-gzip).")
+        parser.add_argument('--batch-size', type=int, default=export.BATCH_SIZE, help='Blogs read and written at a time.')
+        parser.add_argument('--no-gzip', action='store_true', help='Write the export uncompressed.')
+
+    def handle(self, *args, **options):
+        export_format = options['type']
+        output = options['output'] or export.file_name(export_format, compressed=not options['no_gzip'])
+        if options['no_gzip']:
+            chunks = export.generate(export_format, batch_size=options['batch_size'])
+        else:
+            chunks = export.generate_gzip(export_format, batch_size=options['batch_size'])
+
+        started = time.perf_counter()
+        size = 0
+        file = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        try:
+            for chunk in chunks:
+                file.write(chunk)
+                size += len(chunk)
+        finally:
+            if file is not sys.stdout.buffer:
+                file.close()
+        if output != '-':
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(f'Wrote {size} bytes to {output} in {elapsed:.1f}s.'))
@@ -0,0 +1,48 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from blog import importer
+
+
+# Management command importing blogs from a JSON lines or CSV file (optionally gzip-compressed), such as the
+# files written by export_blogs. Records are parsed in chunks, optionally by worker processes, and each chunk
+# is inserted in one transaction with bulk inserts. Invalid records and records of unknown authors are skipped
+# and reported; progress is reported in rows per second after every chunk.
+class Command(BaseCommand):
+    help = 'Imports blogs from a JSON lines or CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file (.jsonl, .ndjson or .csv, optionally .gz).')
+        parser.add_argument('--type', choices=importer.IMPORT_FORMATS, help='Input format (default: from the file name).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert.')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per transaction.')
+        parser.add_argument('--workers', type=int, default=0, help='Processes parsing the input (0: parse inline).')
+        parser.add_argument('--no-index', action='store_true',
+                            help='Do not index the blogs for search (run rebuild_search_index afterwards).')
+        parser.add_argument('--max-errors', type=int, default=20, help='Skipped records reported individually.')
+
+    def handle(self, *args, **options):
+        input_format = options['type'] or importer.guess_format(options['path'])
+        try:
+            file = importer.open_input(options['path'])
+        except OSError as exc:
+            raise CommandError(f'Cannot read {options["path"]}: {exc}')
+
+        blog_importer = importer.Importer(batch_size=options['batch_size'], index=not options['no_index'])
+        skipped = 0
+        started = time.perf_counter()
+        with file:
+            raw_records = importer.read_raw(file, input_format)
+            for records, errors in importer.parse_chunks(raw_records, input_format, options['chunk_size'], options['workers']):
+                errors += blog_importer.insert(records)
+                for line_number, error in sorted(errors)[:max(options['max_errors'] - skipped, 0)]:
+                    self.stderr.write(f'Line {line_number}: {error}')
+                skipped += len(errors)
+                rate = blog_importer.imported / (time.perf_counter() - started)
+                self.stdout.write(f'{blog_importer.imported} imported, {skipped} skipped, {rate:.0f} rows/s')
+        blog_importer.finish()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {blog_importer.imported} blogs in {elapsed:.1f}s '
+            f'({blog_importer.imported / elapsed:.0f} rows/s), skipped {skipped}.'
+        ))
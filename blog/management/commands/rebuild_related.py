@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from blog.related import rebuild
+
+
+# Management command recomputing the related blogs of every published blog, e.g. after a bulk import
+# or to refresh the scores as tag counts drift.
+class Command(BaseCommand):
+    help = 'Recomputes the related blogs of all published blogs.'
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Computed the related blogs of {count} blogs.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from blog.search import rebuild_index
+
+
+# Management command to rebuild the full-text search index from the Blog table.
+class Command(BaseCommand):
+    help = 'Rebuilds the blog full-text search index.'
+
+    def handle(self, *args, **options):
+        total = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} blogs.'))
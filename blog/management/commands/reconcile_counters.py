@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from blog.counters import reconcile
+
+
+# Management command recomputing the category and tag post counters from the blogs.
+# Meant to run periodically (e.g. from cron) to repair drift from writes that bypass the API,
+# such as deleting a user together with their blogs.
+class Command(BaseCommand):
+    help = 'Recomputes the published post counters of categories and tags.'
+
+    def handle(self, *args, **options):
+        categories, tags = reconcile()
+        self.stdout.write(self.style.SUCCESS(f'Corrected {categories} categories and {tags} tags.'))
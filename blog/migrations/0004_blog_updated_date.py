@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_blog_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='Updated_Date',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
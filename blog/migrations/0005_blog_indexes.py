@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_blog_updated_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='name',
+            field=models.CharField(db_index=True, max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['Published_Date'], name='blog_published_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(condition=models.Q(('Published_Date__isnull', False)), fields=['-Published_Date', '-id'], name='blog_published_only_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['Category', 'Published_Date'], name='blog_category_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['Author', 'Published_Date'], name='blog_author_published_idx'),
+        ),
+    ]
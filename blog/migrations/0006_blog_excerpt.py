@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+# Fills in the excerpt of the existing blogs.
+def fill_excerpts(apps, schema_editor):
+    from blog.models import make_excerpt
+
+    Blog = apps.get_model('blog', 'Blog')
+    batch = []
+    for blog in Blog.objects.only('id', 'Content').iterator(chunk_size=1000):
+        blog.Excerpt = make_excerpt(blog.Content)
+        batch.append(blog)
+        if len(batch) == 1000:
+            Blog.objects.bulk_update(batch, ['Excerpt'])
+            batch = []
+    if batch:
+        Blog.objects.bulk_update(batch, ['Excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_blog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='Excerpt',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
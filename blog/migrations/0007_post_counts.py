@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+# Computes the counters of the existing categories and tags.
+def fill_post_counts(apps, schema_editor):
+    from blog.counters import reconcile
+
+    reconcile(apps.get_model('blog', 'Blog'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_blog_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['-post_count', 'name'], name='tag_post_count_idx'),
+        ),
+        migrations.RunPython(fill_post_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Computes the related blogs of the existing published blogs.
+def fill_related_blogs(apps, schema_editor):
+    from blog.related import rebuild
+
+    rebuild(apps.get_model('blog', 'Blog'), apps.get_model('blog', 'RelatedBlog'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_post_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedBlog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('blog', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_blogs', to='blog.blog')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.blog')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['blog', '-score', '-related'], name='related_blog_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('blog', 'related'), name='related_blog_unique')],
+            },
+        ),
+        migrations.RunPython(fill_related_blogs, migrations.RunPython.noop),
+    ]
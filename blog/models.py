@@ -1,13 +1,35 @@
-from django.db import models
+from collections import deque
+from django.db import connection, models
+from django.db.models import Max
+from django.utils.text import Truncator
 from accounts.models import User
 
+# Number of characters of Content kept in a blog's stored excerpt.
+EXCERPT_LENGTH = 200
+
+
+# Returns the excerpt stored for a blog content: the first EXCERPT_LENGTH characters, cut on a word.
+def make_excerpt(content):
+    return Truncator(' '.join((content or '').split())).chars(EXCERPT_LENGTH)
+
+
 # Model to represent a Tag with a unique name.
 class Tag(models.Model):
     name = models.CharField(max_length=255, unique=True, default="")
+    # Number of published blogs with this tag, maintained by blog.counters.
+    post_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Most used tags first (tag cloud), read in index order.
+            models.Index(fields=['-post_count', 'name'], name='tag_post_count_idx'),
+        ]
 
 # Model to represent a Category with a name.
 class Category(models.Model):
-    name = models.CharField(max_length=30)
+    name = models.CharField(max_length=30, db_index=True)
+    # Number of published blogs in this category, maintained by blog.counters.
+    post_count = models.PositiveIntegerField(default=0)
 
 
 # Model to represent a Blog post.
@@ -15,7 +37,68 @@ class Blog(models.Model):
     Author = models.ForeignKey(User, on_delete=models.CASCADE)
     Title = models.CharField(max_length=255)
     Content = models.TextField()
+    # Short version of Content shown by the list endpoints, filled in on save.
+    Excerpt = models.CharField(max_length=255, blank=True, default='')
     Created_Date = models.DateTimeField(auto_now_add=True)
     Published_Date = models.DateTimeField(auto_now_add=False, null=True, blank=True)
+    Updated_Date = models.DateTimeField(auto_now=True)
     Category = models.ForeignKey('Category', on_delete=models.RESTRICT)
     tags = models.ManyToManyField('Tag', related_name='blogs', blank=True)
+
+    # Keeps the stored excerpt in sync with the content.
+    def save(self, *args, **kwargs):
+        self.Excerpt = make_excerpt(self.Content)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'Content' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'Excerpt'}
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # Blog list filtering and ordering on the publication date.
+            models.Index(fields=['Published_Date'], name='blog_published_date_idx'),
+            # Published blogs only, in list order (ignored on databases without partial indexes).
+            models.Index(fields=['-Published_Date', '-id'], name='blog_published_only_idx',
+                         condition=models.Q(Published_Date__isnull=False)),
+            # Blogs of a category or an author by publication date.
+            models.Index(fields=['Category', 'Published_Date'], name='blog_category_published_idx'),
+            models.Index(fields=['Author', 'Published_Date'], name='blog_author_published_idx'),
+        ]
+
+
+# Inserts blogs with batched INSERTs and sets their primary keys; call it in a transaction. Backends such as
+# MySQL do not return the new keys from a bulk insert: the blogs with an id above the highest one before the
+# insert (only this transaction's under the default isolation level) are read back with one query and matched
+# to the inserted blogs by author, category, title and publication date, in id order.
+def bulk_insert_blogs(blogs, batch_size):
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Blog.objects.bulk_create(blogs, batch_size=batch_size)
+    last_id = Blog.objects.aggregate(last=Max('id'))['last'] or 0
+    Blog.objects.bulk_create(blogs, batch_size=batch_size)
+    pending = {}
+    for blog in blogs:
+        pending.setdefault((blog.Author_id, blog.Category_id, blog.Title, blog.Published_Date), deque()).append(blog)
+    rows = (Blog.objects.filter(id__gt=last_id, Author__in={blog.Author_id for blog in blogs}).order_by('id')
+            .values_list('id', 'Author', 'Category', 'Title', 'Published_Date'))
+    for blog_id, *key in rows:
+        same = pending.get(tuple(key))
+        if same:
+            same.popleft().id = blog_id
+    return blogs
+
+
+# Precomputed related blogs of a published blog: the best RELATED_POSTS_SIZE other published blogs by tag
+# overlap and category, with their score. Maintained by blog.related.
+class RelatedBlog(models.Model):
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name='related_blogs')
+    related = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['blog', 'related'], name='related_blog_unique'),
+        ]
+        indexes = [
+            # Related blogs of a blog, best first.
+            models.Index(fields=['blog', '-score', '-related'], name='related_blog_score_idx'),
+        ]
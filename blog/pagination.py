@@ -1,20 +1,183 @@
-from rest_framework.pagination import LimitOffsetPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+# Parses a 'limit' query parameter: falls back to the default for invalid values and caps it at max_limit.
+def parse_limit(limit, default_limit, max_limit):
+    if limit is None:
+        return default_limit
+    try:
+        limit = int(limit)
+    except ValueError:
+        return default_limit
+    if limit <= 0:
+        return default_limit
+    return min(limit, max_limit)
+
 
 # Custom pagination class to handle pagination for Blog API with limit and offset.
 class BlogPagination(LimitOffsetPagination):
     # Default number of items per page when no 'limit' is specified in the request.
     default_limit = 10
+    # Upper bound for the 'limit' query parameter.
+    max_limit = 100
+    # Query parameter to skip the COUNT(*) query ('?count=false').
+    count_query_param = 'count'
+
+    # Custom method to get the 'limit' from the request query parameters, capped at max_limit.
+    def get_limit(self, request):
+        return parse_limit(request.query_params.get(self.limit_query_param), self.default_limit, self.max_limit)
+
+    # Returns True unless the client asked to skip the count with '?count=false'.
+    def should_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() not in ('false', '0', 'no')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.should_count(request):
+            return super().paginate_queryset(queryset, request, view)
+        # Without a count, fetch one extra row to know whether there is a next page.
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        self.count = None
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        return rows[:self.limit]
+
+    # Async counterpart of paginate_queryset for async views, using the async ORM (acount, async for).
+    # Also accepts search results, which provide acount() and aslice().
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        self.count = await queryset.acount() if self.should_count(request) else None
+        stop = self.offset + self.limit + 1
+        if hasattr(queryset, 'aslice'):
+            rows = await queryset.aslice(self.offset, stop)
+        else:
+            rows = [row async for row in queryset[self.offset:stop]]
+        self.has_next = len(rows) > self.limit
+        return rows[:self.limit]
+
+    def get_next_link(self):
+        if self.count is None and not self.has_next:
+            return None
+        if self.count is not None and self.offset + self.limit >= self.count:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+
+# Keyset (cursor) pagination for blogs.
+# Pages are fetched with a "WHERE (field, id) > (last field, last id)" condition instead of an OFFSET,
+# so a deep page costs the same as the first one, and no COUNT(*) is run.
+class BlogCursorPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    ordering_query_param = 'sort'
+    default_limit = 10
+    max_limit = 100
+    # Fields the pages can be ordered by, the primary key is always used as the tie breaker.
+    ordering_fields = ['Published_Date', 'Category']
+    default_ordering = '-Published_Date'
 
-    # Custom method to get the 'limit' from the request query parameters.
     def get_limit(self, request):
-        # Retrieve the 'limit' parameter from the request's query parameters.
-        limit = request.query_params.get('limit', None)
-        # If a 'limit' is provided in the query params, try to convert it to an integer.
-        if limit is not None:
-            try:
-                return int(limit)
-            except ValueError:
-                # If the value cannot be converted to an integer, return the default limit.
-                return self.default_limit
-        # If no 'limit' is provided, return the default limit.
-        return self.default_limit if limit is None else limit
\ No newline at end of file
+        return parse_limit(request.query_params.get(self.limit_query_param), self.default_limit, self.max_limit)
+
+    # Returns the requested ordering ('field' or '-field'), limited to the view's ordering fields.
+    def get_ordering(self, request, view):
+        ordering = request.query_params.get(self.ordering_query_param) or self.default_ordering
+        ordering_fields = getattr(view, 'ordering_fields', self.ordering_fields)
+        if ordering.lstrip('-') not in ordering_fields:
+            return self.default_ordering
+        return ordering
+
+    # Cursors are url-safe base64 JSON holding the ordering, the key of the boundary row and the direction.
+    # Rows are model instances or values() dicts.
+    def encode_cursor(self, row, reverse):
+        if isinstance(row, dict):
+            value, pk = row[self.attname], row['id']
+        else:
+            value, pk = getattr(row, self.attname), row.pk
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        data = {'o': self.ordering, 'v': value, 'pk': pk, 'r': reverse}
+        encoded = urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    # Link to the page that follows `row` in the default ordering, for a first page fetched without
+    # paginate_queryset (e.g. the latest blogs of each category in the category list).
+    def get_link_after(self, base_url, model, row):
+        self.base_url = base_url
+        self.ordering = self.default_ordering
+        self.attname = model._meta.get_field(self.ordering.lstrip('-')).attname
+        return self.encode_cursor(row, reverse=False)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode()))
+            if data['o'] != self.ordering:
+                raise ValueError('Cursor ordering does not match the requested ordering')
+            return self.field.to_python(data['v']), int(data['pk']), bool(data['r'])
+        except Exception:
+            raise NotFound('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.limit = self.get_limit(request)
+        self.ordering = self.get_ordering(request, view)
+        self.field = queryset.model._meta.get_field(self.ordering.lstrip('-'))
+        self.attname = self.field.attname
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor[2] if cursor else False
+        # Walking backwards (previous page) flips the ordering, the page is reversed afterwards.
+        descending = self.ordering.startswith('-') != reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(prefix + self.attname, prefix + 'pk')
+        if cursor:
+            value, pk, _ = cursor
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.attname}__{lookup}': value}) | Q(**{self.attname: value, f'pk__{lookup}': pk})
+            )
+
+        rows = list(queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
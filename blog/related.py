@@ -0,0 +1,167 @@
+import heapq
+import math
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Window
+from django.db.models.functions import RowNumber
+from jobs.queue import enqueue
+from .models import Blog, RelatedBlog
+
+# Related blogs: the published blogs sharing the most (and the rarest) tags with a blog, and its category.
+# Score of two blogs = sum over their shared tags of log(1 + published blogs / blogs with the tag), so rare
+# tags count more (the counts come from Tag.post_count, see blog.counters), plus RELATED_CATEGORY_WEIGHT if
+# they are in the same category.
+# Candidates are read from the blog/tag table, the inverted index from tags to blogs: the latest
+# RELATED_MAX_POSTINGS published blogs of each tag of the blog, and the latest blogs of its category, with one
+# windowed query each for a whole batch of blogs. The best RELATED_POSTS_SIZE are stored as RelatedBlog rows,
+# so reads are one indexed query.
+# When a blog's tags, category or publication change through BlogSerializer, a background job recomputes its
+# list and, the score being symmetric, inserts the blog into the lists of its candidates it now belongs to.
+# Scores drift as tag counts change; the rebuild_related command recomputes every list.
+
+
+def get_size():
+    return getattr(settings, 'RELATED_POSTS_SIZE', 10)
+
+
+def tag_weight(post_count, total):
+    return math.log(1 + total / max(post_count, 1))
+
+
+# Latest published blogs of each given tag, at most RELATED_MAX_POSTINGS per tag, as
+# {tag id: [(blog id, category id)]}: one windowed query on the blog/tag table for any number of tags.
+def get_postings(tag_ids, blog_model=Blog):
+    postings = {tag_id: [] for tag_id in tag_ids}
+    if not tag_ids:
+        return postings
+    position = Window(RowNumber(), partition_by=F('tag_id'),
+                      order_by=[F('blog__Published_Date').desc(), F('blog_id').desc()])
+    links = (blog_model.tags.through.objects.filter(tag_id__in=tag_ids, blog__Published_Date__isnull=False)
+             .annotate(position=position).filter(position__lte=getattr(settings, 'RELATED_MAX_POSTINGS', 500))
+             .values_list('tag_id', 'blog_id', 'blog__Category_id'))
+    for tag_id, blog_id, category_id in links:
+        postings[tag_id].append((blog_id, category_id))
+    return postings
+
+
+# Latest published blogs of each given category, at most `limit` + 1 per category (the blog itself may be one).
+def get_category_blogs(category_ids, limit, blog_model=Blog):
+    position = Window(RowNumber(), partition_by=F('Category'), order_by=[F('Published_Date').desc(), F('id').desc()])
+    blogs = (blog_model.objects.filter(Category__in=category_ids, Published_Date__isnull=False)
+             .annotate(position=position).filter(position__lte=limit + 1).values_list('Category_id', 'id'))
+    latest = {category_id: [] for category_id in category_ids}
+    for category_id, blog_id in blogs:
+        latest[category_id].append(blog_id)
+    return latest
+
+
+# Scores the candidates related to a published blog, returns {blog id: score}.
+# `tags` maps the blog's tag ids to their number of published blogs, `total` is the number of published blogs.
+def score_candidates(blog_id, category_id, tags, total, postings, category_blogs):
+    category_weight = getattr(settings, 'RELATED_CATEGORY_WEIGHT', 1.0)
+    scores = {}
+    same_category = set()
+    for tag_id, post_count in tags.items():
+        weight = tag_weight(post_count, total)
+        for other, other_category in postings[tag_id]:
+            scores[other] = scores.get(other, 0.0) + weight
+            if other_category == category_id:
+                same_category.add(other)
+    for other in same_category:
+        scores[other] += category_weight
+    # The latest blogs of the category are candidates even without a shared tag.
+    for other in category_blogs:
+        scores.setdefault(other, category_weight)
+    scores.pop(blog_id, None)
+    return scores
+
+
+# Rows adding a blog to the lists of its candidates (except those in `skip`): the lists with fewer than
+# `size` related blogs, or whose lowest score it beats.
+def reverse_rows(blog_id, scores, size, skip, related_model):
+    lists = (related_model.objects.filter(blog_id__in=list(scores)).order_by()
+             .values('blog_id').annotate(count=Count('id'), lowest=Min('score')))
+    full = {row['blog_id']: row['lowest'] for row in lists if row['count'] >= size}
+    return [
+        related_model(blog_id=other, related_id=blog_id, score=score)
+        for other, score in scores.items()
+        if other not in skip and (other not in full or score > full[other])
+    ]
+
+
+# Keeps the best `size` related blogs of the given blogs.
+def trim(blog_ids, size, related_model):
+    position = Window(RowNumber(), partition_by=F('blog_id'), order_by=[F('score').desc(), F('related_id').desc()])
+    extra = (related_model.objects.filter(blog_id__in=blog_ids)
+             .annotate(position=position).filter(position__gt=size).values_list('id', flat=True))
+    related_model.objects.filter(id__in=list(extra)).delete()
+
+
+# Recomputes the related blogs of the given blogs in one transaction. With `reverse`, the blogs are also
+# removed from, and added back with their new score to, the lists of the other blogs.
+def refresh(blog_ids, reverse=True, blog_model=Blog, related_model=RelatedBlog):
+    size = get_size()
+    blog_ids = set(blog_ids)
+    published = list(blog_model.objects.filter(pk__in=blog_ids, Published_Date__isnull=False).values_list('id', 'Category_id'))
+    tags = {}
+    links = blog_model.tags.through.objects.filter(blog_id__in=blog_ids)
+    for blog_id, tag_id, post_count in links.values_list('blog_id', 'tag_id', 'tag__post_count'):
+        tags.setdefault(blog_id, {})[tag_id] = post_count
+    with transaction.atomic():
+        related_model.objects.filter(blog_id__in=blog_ids).delete()
+        if reverse:
+            related_model.objects.filter(related_id__in=blog_ids).delete()
+        if not published:
+            return
+        # Candidates of the whole batch, read together.
+        total = blog_model.objects.filter(Published_Date__isnull=False).count()
+        postings = get_postings({tag_id for blog_id, _ in published for tag_id in tags.get(blog_id, {})}, blog_model)
+        category_blogs = get_category_blogs({category_id for _, category_id in published}, size, blog_model)
+        rows, reversed_lists = [], set()
+        for blog_id, category_id in published:
+            scores = score_candidates(blog_id, category_id, tags.get(blog_id, {}), total, postings, category_blogs[category_id])
+            best = heapq.nlargest(size, scores.items(), key=lambda item: (item[1], item[0]))
+            rows += [related_model(blog_id=blog_id, related_id=other, score=score) for other, score in best]
+            if reverse and scores:
+                # The lists of the other blogs of the batch are computed above.
+                added = reverse_rows(blog_id, scores, size, blog_ids, related_model)
+                rows += added
+                reversed_lists.update(row.blog_id for row in added)
+        related_model.objects.bulk_create(rows)
+        if reversed_lists:
+            trim(reversed_lists, size, related_model)
+
+
+# Recomputes the related blogs of every published blog, returns their number.
+def rebuild(blog_model=Blog, related_model=RelatedBlog, batch_size=500):
+    related_model.objects.all().delete()
+    published = blog_model.objects.filter(Published_Date__isnull=False).order_by('id').values_list('id', flat=True)
+    count = 0
+    batch = []
+    for blog_id in published.iterator(chunk_size=batch_size):
+        batch.append(blog_id)
+        if len(batch) == batch_size:
+            refresh(batch, reverse=False, blog_model=blog_model, related_model=related_model)
+            count += len(batch)
+            batch = []
+    if batch:
+        refresh(batch, reverse=False, blog_model=blog_model, related_model=related_model)
+        count += len(batch)
+    return count
+
+
+# Ids of the related blogs of a blog, best first.
+def get_related_ids(blog_id, limit):
+    related = RelatedBlog.objects.filter(blog_id=blog_id).order_by('-score', '-related_id')
+    return list(related.values_list('related_id', flat=True)[:limit])
+
+
+# Background job handler (jobs.queue): refreshes the blogs of a batch of jobs ({'ids': [blog ids]} payloads).
+def refresh_job(payloads):
+    refresh({blog_id for payload in payloads for blog_id in payload['ids']})
+
+
+# Queues the refresh of blogs whose tags, category or publication changed, as one job.
+def schedule_refresh(blog_ids):
+    if blog_ids:
+        enqueue('blog.related.refresh_job', {'ids': list(blog_ids)})
@@ -0,0 +1,403 @@
+import re
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Q
+from jobs.queue import enqueue
+from accounts.models import User
+from .models import Blog, Category, Tag
+
+# Name of the table holding the inverted index (FTS5 virtual table on sqlite, FULLTEXT table on MySQL).
+SEARCH_TABLE = 'blog_search'
+
+# Splits a raw search query into word tokens, dropping any full-text operators the user typed.
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query or '')
+
+
+# Builds the document (title, content, tags, author) that is stored in the index for a blog.
+def build_document(blog):
+    tags = ' '.join(tag.name for tag in blog.tags.all())
+    return [blog.Title, blog.Content, tags, blog.Author.username]
+
+
+# Primary key of a blog loaded as a model instance or as a values() row.
+def blog_id(row):
+    return row['id'] if isinstance(row, dict) else row.pk
+
+
+# Lazily evaluated search result set.
+# Supports count() and slicing so BlogPagination only fetches the ids of the requested page.
+# `restrict` (a values('id') queryset of blogs) limits the matches to the selected blogs.
+class SearchResults:
+    def __init__(self, backend, terms, queryset=None, restrict=None):
+        self.backend = backend
+        self.terms = terms
+        self.queryset = queryset if queryset is not None else Blog.objects.all()
+        self.restrict = restrict
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.terms, self.restrict)
+        return self._count
+
+    # SQL and parameters selecting the ids of the matching blogs, unordered.
+    def matched_query(self):
+        return self.backend.matched_query(self.terms, self.restrict)
+
+    def __len__(self):
+        return self.count()
+
+    # Loads the blogs (model instances or values() rows) with the given ids in one query,
+    # in the order of the ids.
+    def fetch(self, ids):
+        blogs = {blog_id(row): row for row in self.queryset.filter(pk__in=ids)}
+        return [blogs[pk] for pk in ids if pk in blogs]
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        offset = item.start or 0
+        limit = (item.stop - offset) if item.stop is not None else self.count() - offset
+        ids = self.backend.ranked_ids(self.terms, limit, offset, self.restrict)
+        # Fetch the page with one query and restore the relevance order of the index.
+        return self.fetch(ids)
+
+    # Iterates over all results in relevance order, reading the ids chunk by chunk from one cursor
+    # and loading the blogs of each chunk with one query, so memory does not grow with the result size.
+    def iterator(self, chunk_size=500):
+        sql, params = self.backend.ranked_query(self.terms, self.restrict)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            while True:
+                ids = [row[0] for row in cursor.fetchmany(chunk_size)]
+                if not ids:
+                    break
+                yield from self.fetch(ids)
+
+    # Async counterparts for async views. Raw index queries have no async API, so they run
+    # through sync_to_async; the blogs themselves are loaded with the async ORM.
+    async def acount(self):
+        if self._count is None:
+            self._count = await sync_to_async(self.backend.count)(self.terms, self.restrict)
+        return self._count
+
+    async def aslice(self, start, stop):
+        ids = await sync_to_async(self.backend.ranked_ids)(self.terms, stop - start, start, self.restrict)
+        blogs = {blog_id(row): row async for row in self.queryset.filter(pk__in=ids)}
+        return [blogs[pk] for pk in ids if pk in blogs]
+
+
+# Adds "AND <column> IN (<restrict>)" to a query on the index, restrict being a values('id') queryset of blogs.
+def restrict_query(sql, params, column, restrict):
+    if restrict is None:
+        return sql, params
+    restrict_sql, restrict_params = restrict.query.sql_with_params()
+    return f"{sql} AND {column} IN ({restrict_sql})", params + list(restrict_params)
+
+
+# SQLite backend using an FTS5 virtual table ranked with bm25.
+class SQLiteSearchBackend:
+    # Column weights for bm25: title, content, tags, author.
+    weights = (10.0, 1.0, 5.0, 2.0)
+
+    def create_index(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+            "USING fts5(title, content, tags, author, tokenize='unicode61')"
+        )
+
+    def drop_index(self, schema_editor):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+    # Every term is matched as a quoted prefix, all terms must match.
+    def match_expression(self, terms):
+        return ' '.join('"%s"*' % term.replace('"', '""') for term in terms)
+
+    def index(self, blog_id, document):
+        self.index_many([(blog_id, document)])
+
+    # Replaces the entries of many blogs with one DELETE and one batched INSERT.
+    def index_many(self, documents):
+        if not documents:
+            return
+        placeholders = ', '.join(['%s'] * len(documents))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})",
+                [blog_id for blog_id, _ in documents],
+            )
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, title, content, tags, author) VALUES (%s, %s, %s, %s, %s)",
+                [[blog_id, *document] for blog_id, document in documents],
+            )
+
+    def remove(self, blog_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [blog_id])
+
+    # SQL and parameters selecting the ids of the matching blogs, within `restrict` if given.
+    def matched_query(self, terms, restrict=None):
+        sql = f"SELECT rowid AS id FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s"
+        return restrict_query(sql, [self.match_expression(terms)], 'rowid', restrict)
+
+    def count(self, terms, restrict=None):
+        sql, params = self.matched_query(terms, restrict)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM ({sql}) matched", params)
+            return cursor.fetchone()[0]
+
+    # SQL and parameters selecting the ids of the matching blogs, best match first.
+    def ranked_query(self, terms, restrict=None):
+        weights = ', '.join(str(weight) for weight in self.weights)
+        sql, params = self.matched_query(terms, restrict)
+        return sql + f" ORDER BY bm25({SEARCH_TABLE}, {weights}), rowid DESC", params
+
+    def ranked_ids(self, terms, limit, offset, restrict=None):
+        sql, params = self.ranked_query(terms, restrict)
+        with connection.cursor() as cursor:
+            cursor.execute(sql + " LIMIT %s OFFSET %s", params + [limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+
+# MySQL backend using an InnoDB table with a FULLTEXT index, queried in boolean mode.
+class MySQLSearchBackend:
+    def create_index(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+            "blog_id BIGINT NOT NULL PRIMARY KEY, title VARCHAR(255) NOT NULL, content LONGTEXT NOT NULL, "
+            "tags TEXT NOT NULL, author VARCHAR(150) NOT NULL, "
+            "FULLTEXT KEY blog_search_fulltext (title, content, tags, author)) ENGINE=InnoDB"
+        )
+
+    def drop_index(self, schema_editor):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+    # Every term is required and matched as a prefix.
+    def match_expression(self, terms):
+        return ' '.join('+%s*' % term for term in terms)
+
+    def index(self, blog_id, document):
+        self.index_many([(blog_id, document)])
+
+    # Replaces the entries of many blogs with one batched REPLACE.
+    def index_many(self, documents):
+        if not documents:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"REPLACE INTO {SEARCH_TABLE} (blog_id, title, content, tags, author) VALUES (%s, %s, %s, %s, %s)",
+                [[blog_id, *document] for blog_id, document in documents],
+            )
+
+    def remove(self, blog_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE blog_id = %s", [blog_id])
+
+    # SQL and parameters selecting the ids of the matching blogs, within `restrict` if given.
+    def matched_query(self, terms, restrict=None):
+        sql = (f"SELECT blog_id AS id FROM {SEARCH_TABLE} "
+               "WHERE MATCH (title, content, tags, author) AGAINST (%s IN BOOLEAN MODE)")
+        return restrict_query(sql, [self.match_expression(terms)], 'blog_id', restrict)
+
+    def count(self, terms, restrict=None):
+        sql, params = self.matched_query(terms, restrict)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM ({sql}) matched", params)
+            return cursor.fetchone()[0]
+
+    # SQL and parameters selecting the ids of the matching blogs, best match first.
+    def ranked_query(self, terms, restrict=None):
+        sql, params = self.matched_query(terms, restrict)
+        sql += (" ORDER BY MATCH (title, content, tags, author) AGAINST (%s IN BOOLEAN MODE) DESC, blog_id DESC")
+        return sql, params + [self.match_expression(terms)]
+
+    def ranked_ids(self, terms, limit, offset, restrict=None):
+        sql, params = self.ranked_query(terms, restrict)
+        with connection.cursor() as cursor:
+            cursor.execute(sql + " LIMIT %s OFFSET %s", params + [limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+
+# Backend per database vendor. Other databases fall back to the ORM (see search()).
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'mysql': MySQLSearchBackend,
+}
+
+
+def get_backend(vendor=None):
+    backend_class = BACKENDS.get(vendor or connection.vendor)
+    return backend_class() if backend_class else None
+
+
+# Adds or refreshes the index entry of a blog. Called whenever BlogSerializer saves a blog.
+def index_blog(blog):
+    backend = get_backend()
+    if backend is not None:
+        backend.index(blog.id, build_document(blog))
+
+
+# Adds or refreshes many index entries from (blog id, document) pairs, e.g. after a bulk insert.
+def index_documents(documents):
+    backend = get_backend()
+    if backend is not None:
+        backend.index_many(list(documents))
+
+
+# Indexes the blogs of a queryset in batches of `batch_size`, each loaded with its tags and author in one go and
+# written with one index_many call. Returns the number of indexed blogs.
+def index_queryset(blogs, backend, batch_size=500):
+    total = 0
+    documents = []
+    for blog in blogs.select_related('Author').prefetch_related('tags').iterator(chunk_size=batch_size):
+        documents.append((blog.id, build_document(blog)))
+        if len(documents) == batch_size:
+            backend.index_many(documents)
+            total += len(documents)
+            documents = []
+    backend.index_many(documents)
+    return total + len(documents)
+
+
+# Adds or refreshes the index entries of the given blogs.
+def index_blogs(ids):
+    backend = get_backend()
+    if backend is not None:
+        index_queryset(Blog.objects.filter(pk__in=list(ids)), backend)
+
+
+# Background job handler (jobs.queue): indexes the blogs of a batch of jobs ({'ids': [blog id]} payloads,
+# {'id': blog id} for jobs queued before).
+def index_job(payloads):
+    index_blogs({blog_id for payload in payloads for blog_id in payload.get('ids') or [payload['id']]})
+
+
+# Queues the indexing of created or updated blogs, so the write does not wait for it.
+def schedule_index(blog_ids):
+    if blog_ids:
+        enqueue('blog.search.index_job', {'ids': list(blog_ids)})
+
+
+# Removes a deleted blog from the index.
+def remove_blog(blog_id):
+    backend = get_backend()
+    if backend is not None:
+        backend.remove(blog_id)
+
+
+# post_delete receiver for Blog (connected in BlogConfig.ready): removes the entry of every deleted blog,
+# including the blogs deleted by a cascade from their author or category, so no orphan entry is counted.
+def remove_deleted_blog(sender, instance, **kwargs):
+    remove_blog(instance.pk)
+
+
+# pre_save receiver for User and Tag (connected in BlogConfig.ready): notes whether the username or tag name,
+# which the index stores in the documents of their blogs, is changing.
+def remember_rename(sender, instance, update_fields=None, **kwargs):
+    field = 'username' if sender is User else 'name'
+    instance._search_renamed = False
+    if instance.pk is not None and (update_fields is None or field in update_fields):
+        previous = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+        instance._search_renamed = previous is not None and previous != getattr(instance, field)
+
+
+# post_save receiver for User and Tag: queues the reindexing of the blogs of a renamed author or tag.
+def reindex_renamed(sender, instance, **kwargs):
+    if not getattr(instance, '_search_renamed', False):
+        return
+    if sender is User:
+        blog_ids = Blog.objects.filter(Author=instance).values_list('id', flat=True)
+    else:
+        blog_ids = Blog.tags.through.objects.filter(tag=instance).values_list('blog_id', flat=True)
+    schedule_index(list(blog_ids))
+
+
+# Rebuilds the whole index from the Blog table, returns the number of indexed blogs.
+def rebuild_index():
+    backend = get_backend()
+    if backend is None:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+    return index_queryset(Blog.objects.all(), backend)
+
+
+# Returns the blogs matching the query ordered by relevance, within the blogs matching `filters` (a Q) if given.
+# An empty query matches every blog, newest first.
+def search(query, queryset=None, filters=None):
+    queryset = queryset if queryset is not None else Blog.objects.all()
+    terms = tokenize(query)
+    if not terms:
+        return (queryset.filter(filters) if filters is not None else queryset).order_by('-id')
+    backend = get_backend()
+    if backend is None:
+        # No full-text support: match every term against the same fields as before, without duplicates.
+        condition = filters if filters is not None else Q()
+        for term in terms:
+            condition &= (Q(Title__icontains=term) | Q(Content__icontains=term)
+                          | Q(tags__name__icontains=term) | Q(Author__username__icontains=term))
+        return queryset.filter(condition).distinct().order_by('-id')
+    restrict = Blog.objects.filter(filters).values('id') if filters is not None else None
+    return SearchResults(backend, terms, queryset, restrict)
+
+
+# Fields search results can be counted and filtered by: category name, author username and tag names.
+FACETS = ('Category', 'Author', 'tags')
+
+
+# Filter selecting the blogs with every given facet value (AND-combined): a category name, an author username
+# and any number of tag names. Each condition is an id subquery on an indexed column.
+def facet_filters(category=None, author=None, tags=()):
+    condition = Q()
+    if category:
+        condition &= Q(Category__in=Category.objects.filter(name=category).values('id'))
+    if author:
+        condition &= Q(Author__in=User.objects.filter(username=author).values('id'))
+    for tag in tags:
+        condition &= Q(id__in=Blog.tags.through.objects.filter(tag__name=tag).values('blog_id'))
+    return condition if condition else None
+
+
+# SQL counting the matched blogs per value of a facet.
+def facet_sql(name):
+    qn = connection.ops.quote_name
+    blog = qn(Blog._meta.db_table)
+    if name == 'tags':
+        through = qn(Blog.tags.through._meta.db_table)
+        return (f"SELECT 'tags' AS facet, t.{qn('name')} AS facet_value, COUNT(*) AS facet_count FROM matched "
+                f"JOIN {through} bt ON bt.{qn('blog_id')} = matched.id "
+                f"JOIN {qn(Tag._meta.db_table)} t ON t.{qn('id')} = bt.{qn('tag_id')} GROUP BY t.{qn('id')}, t.{qn('name')}")
+    field = Blog._meta.get_field(name)
+    model = field.related_model
+    label = 'username' if model is User else 'name'
+    return (f"SELECT '{name}' AS facet, v.{qn(label)} AS facet_value, COUNT(*) AS facet_count FROM matched "
+            f"JOIN {blog} b ON b.{qn('id')} = matched.id "
+            f"JOIN {qn(model._meta.db_table)} v ON v.{qn('id')} = b.{qn(field.column)} GROUP BY v.{qn('id')}, v.{qn(label)}")
+
+
+# Counts the search results per category, author and/or tag with one query: the matched ids are grouped by
+# every requested facet at once (UNION ALL), and the `limit` most frequent values of each are kept.
+# Returns {facet: [{'value': ..., 'count': ...}]}, most frequent first.
+def facet_counts(results, names, limit):
+    if isinstance(results, SearchResults):
+        matched_sql, params = results.matched_query()
+    else:
+        matched_sql, params = results.order_by().values('id').distinct().query.sql_with_params()
+    facets = {name: [] for name in names}
+    if not names:
+        return facets
+    counts = ' UNION ALL '.join(facet_sql(name) for name in names)
+    sql = (f"WITH matched AS ({matched_sql}) "
+           "SELECT facet, facet_value, facet_count FROM ("
+           "SELECT facet, facet_value, facet_count, "
+           "ROW_NUMBER() OVER (PARTITION BY facet ORDER BY facet_count DESC, facet_value) AS position "
+           f"FROM ({counts}) counts) ranked WHERE position <= %s ORDER BY facet, position")
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(params) + [limit])
+        for facet, value, count in cursor.fetchall():
+            facets[facet].append({'value': value, 'count': count})
+    return facets
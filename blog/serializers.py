@@ -1,6 +1,10 @@
 from rest_framework import serializers
-from .models import Blog, Category, Tag
+from .models import Blog, Category, Tag, bulk_insert_blogs, make_excerpt
+from accounts.models import User
+from django.db import transaction
 from django.utils.timezone import now
+from Blogging_Platform_Api.instrumentation import TimedSerializerMixin
+from . import autocomplete, caching, counters, related, search
 
 # Serializer for handling a list of Tag objects.
 class TagSerializer(serializers.ListField):
@@ -16,12 +20,32 @@ class TagSerializer(serializers.ListField):
         return tag
     
     # Custom method to represent the Tag objects in a specific format.
-    # Returns a list of tag names (flat list).
+    # Returns a list of tag names (flat list), read from the prefetch cache when the tags were prefetched.
     def to_representation(self, data):
-        return data.values_list('name', flat=True)
+        return [tag.name for tag in data.all()]
  
+# Returns the Tag objects with the given names, creating the missing ones: one insert and one lookup
+# for any number of tags.
+def get_tags(tag_names):
+    tag_names = list(dict.fromkeys(tag_names))
+    Tag.objects.bulk_create([Tag(name=name) for name in tag_names], ignore_conflicts=True)
+    tags = Tag.objects.in_bulk(tag_names, field_name='name')
+    tags = [tags[name] for name in tag_names]
+    # New tags become available to autocomplete once the transaction commits.
+    autocomplete.add_tags(tags)
+    return tags
+
+
+# Formats a published date as 'dd-mm-YYYY HH:MM:SS' (same output as strftime, without its overhead).
+def format_published_date(value):
+    if not value:
+        return None
+    return (f'{value.day:02d}-{value.month:02d}-{value.year:04d} '
+            f'{value.hour:02d}:{value.minute:02d}:{value.second:02d}')
+
+
 # BlogSerializer class to handle serialization and deserialization of Blog model
-class BlogSerializer(serializers.ModelSerializer):
+class BlogSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     # Serializes tags, allows immediate publishing, and formats published date.
     tags = TagSerializer(required=False)
     published_now = serializers.BooleanField(required=False, write_only=True, default=False)
@@ -30,14 +54,47 @@ class BlogSerializer(serializers.ModelSerializer):
     # Specifies the Blog model and the fields to serialize.
     class Meta:
         model = Blog
-        fields = ['Title', 'Content', 'Author', 'tags', 'Category', 'Published_Date', 'published_now']
+        fields = ['Title', 'Content', 'Excerpt', 'Author', 'tags', 'Category', 'Published_Date', 'published_now']
+        read_only_fields = ['Excerpt']
+
+    # Fields rendered by the list, search and filter endpoints when no '?fields=' is given.
+    list_fields = ['Title', 'Excerpt', 'Author', 'tags', 'Category', 'Published_Date']
+    # Text columns deferred at the ORM level when they are not rendered.
+    deferrable_fields = ['Title', 'Content', 'Excerpt']
+
+    # Accepts an optional 'fields' argument restricting the rendered fields (sparse fieldset).
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields) - {'published_now'}:
+                self.fields.pop(name)
+
+    # Returns the fields requested with '?fields=Title,Excerpt,...', or the list representation by default.
+    # Unknown names are ignored.
+    @classmethod
+    def get_requested_fields(cls, query_params):
+        readable = [name for name in cls.Meta.fields if name != 'published_now']
+        requested = [name for name in query_params.get('fields', '').split(',') if name in readable]
+        return requested or list(cls.list_fields)
+
+    # Eager-loads the relations rendered by this serializer, so serializing any number of blogs
+    # costs a fixed number of queries. Author and Category are rendered as primary keys read
+    # from the foreign key columns, so they need no join. When only some fields are rendered,
+    # the text columns that are not are deferred and tags are only prefetched if rendered.
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None):
+        if fields is None:
+            return queryset.prefetch_related('tags')
+        deferred = [name for name in cls.deferrable_fields if name not in fields]
+        if deferred:
+            queryset = queryset.defer(*deferred)
+        if 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        return queryset
 
     def get_Published_Date(self, obj):
         # Returns the formatted published date or None if not available.
-        if obj.Published_Date:
-            return obj.Published_Date.strftime('%d-%m-%Y %H:%M:%S')
-        else:
-            return None
+        return format_published_date(obj.Published_Date)
 
     # Custom create method to handle creation of a new Blog instance
     def create(self, validated_data):
@@ -50,17 +107,26 @@ class BlogSerializer(serializers.ModelSerializer):
         else:
             validated_data['Published_Date'] = None
 
-        # Creates a new Blog object using the remaining validated data.
-        blog = Blog.objects.create(**validated_data)
+        with transaction.atomic():
+            # Creates a new Blog object using the remaining validated data.
+            blog = Blog.objects.create(**validated_data)
 
-        # If there are tags provided, create or get the Tag objects and associate them with the blog.
-        if tag_names:
-            tags = []
-            for tag_name in tag_names:
-                tag, _ = Tag.objects.get_or_create(name=tag_name)
-                tags.append(tag)
-            blog.tags.set(tags) # Sets the tags for the blog.
-        
+            # If there are tags provided, create the missing Tag objects and associate them with the blog.
+            if tag_names:
+                blog.tags.set(get_tags(tag_names)) # Sets the tags for the blog.
+
+            # Counts the blog in its category and tags if it is published.
+            after = counters.counted_state(blog)
+            counters.record_change(None, after)
+            # Queues the computation of its related blogs (and its place in theirs).
+            if after is not None:
+                related.schedule_refresh([blog.id])
+            # Indexes the blog in the full-text search index, in the same transaction as bulk create and imports.
+            search.index_blog(blog)
+            # Offers its title to autocomplete if it is published.
+            autocomplete.update_titles([blog])
+        # Drops the cached payloads that include this blog.
+        caching.invalidate_blog(blog.id)
         # Returns the created blog instance.
         return blog
     
@@ -74,25 +140,200 @@ class BlogSerializer(serializers.ModelSerializer):
         else:
             validated_data['Published_Date'] = None
         
-        # Calls the parent class's update method to update the blog instance with the validated data.
-        blog = super().update(instance, validated_data)
-        # If there are tags provided, create or get the Tag objects and associate them with the blog.
-        if tag_names:
-            tags = []
-            for tag_name in tag_names:
-                tag, _ = Tag.objects.get_or_create(name=tag_name)
-                tags.append(tag)
-            blog.tags.set(tags) # Sets the tags for the blog.
+        with transaction.atomic():
+            # Counted state before the update, the counters get the difference with the state after it.
+            before = counters.counted_state(instance)
+            title = instance.Title
+            # Calls the parent class's update method to update the blog instance with the validated data.
+            blog = super().update(instance, validated_data)
+            # If there are tags provided, create the missing Tag objects and associate them with the blog.
+            if tag_names:
+                blog.tags.set(get_tags(tag_names)) # Sets the tags for the blog.
+            after = counters.counted_state(blog)
+            counters.record_change(before, after)
+            # Related blogs depend on the same state as the counters: tags, category and publication.
+            if after != before:
+                related.schedule_refresh([blog.id])
+            # Refreshes the blog's entry in the full-text search index.
+            search.index_blog(blog)
+            # Replaces its title in autocomplete (removed if it is no longer published).
+            autocomplete.update_titles([blog], removed=[(title, blog.id)])
+        # Drops the cached payloads that include this blog.
+        caching.invalidate_blog(blog.id)
         # Returns the updated blog instance.
         return blog
         
-class CategorySerializer(serializers.ModelSerializer):
-    # To include related blogs, use the reverse relationship (many-to-one from Blog to Category)
-    blogs = BlogSerializer(many=True, read_only=True)
+# Read-only fast path for lists of blogs: builds the same dicts as BlogSerializer straight from
+# .values() rows, without model instances or serializer fields, with the tag names of all rows
+# fetched in a single query. The instance is the list of rows, .data is the list of blogs.
+class BlogValuesSerializer(TimedSerializerMixin, serializers.BaseSerializer):
+    # Model column read for each rendered field (tags are fetched separately).
+    columns = {
+        'Title': 'Title',
+        'Content': 'Content',
+        'Excerpt': 'Excerpt',
+        'Author': 'Author_id',
+        'Category': 'Category_id',
+        'Published_Date': 'Published_Date',
+    }
+    # Columns always selected: the primary key and the keys used for ordering and cursors.
+    key_columns = ['id', 'Published_Date', 'Category_id']
+
+    # Renders the given fields (all readable BlogSerializer fields if None), in BlogSerializer's order.
+    def __init__(self, instance=None, fields=None, **kwargs):
+        super().__init__(instance, **kwargs)
+        readable = [name for name in BlogSerializer.Meta.fields if name != 'published_now']
+        self.rendered_fields = [name for name in readable if fields is None or name in fields]
+
+    # Turns a Blog queryset into a values() queryset with the columns needed for the given fields.
+    @classmethod
+    def get_queryset(cls, queryset, fields):
+        columns = [cls.columns[name] for name in fields if name in cls.columns]
+        return queryset.values(*dict.fromkeys(cls.key_columns + columns))
+
+    # Tag names of the given blogs, keyed by blog id, with one query.
+    def get_tag_names(self, ids):
+        tag_names = {pk: [] for pk in ids}
+        for blog_id, name in Tag.objects.filter(blogs__in=ids).values_list('blogs', 'name'):
+            tag_names[blog_id].append(name)
+        return tag_names
+
+    # Async counterpart of .data for async views: the rows are already loaded, the tag names are fetched
+    # with the async ORM, and rendering does no I/O.
+    async def adata(self):
+        rows = list(self.instance)
+        self.tag_names = {row['id']: [] for row in rows}
+        if 'tags' in self.rendered_fields:
+            async for blog_id, name in Tag.objects.filter(blogs__in=list(self.tag_names)).values_list('blogs', 'name'):
+                self.tag_names[blog_id].append(name)
+        return self.to_representation(rows)
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        tag_names = getattr(self, 'tag_names', None)
+        if tag_names is None:
+            tag_names = self.get_tag_names([row['id'] for row in rows]) if 'tags' in self.rendered_fields else {}
+        getters = []
+        for name in self.rendered_fields:
+            if name == 'tags':
+                getters.append((name, lambda row: tag_names[row['id']]))
+            elif name == 'Published_Date':
+                getters.append((name, lambda row: format_published_date(row['Published_Date'])))
+            else:
+                column = self.columns[name]
+                getters.append((name, lambda row, column=column: row[column]))
+        return [{name: getter(row) for name, getter in getters} for row in rows]
+
+
+# Primary key field resolving its values from objects preloaded into the serializer context
+# ('preloaded' -> field name -> {pk: object}) instead of running one query per value.
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        objects = self.context.get('preloaded', {}).get(self.field_name)
+        if objects is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return objects[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+# Serializer validating many blogs at once for bulk creation.
+# Authors and categories of the whole batch are loaded with one query each.
+class BlogBulkSerializer(BlogSerializer):
+    tags = TagSerializer(child=serializers.CharField(max_length=255), required=False)
+    Author = PreloadedPrimaryKeyRelatedField(queryset=User.objects.all())
+    Category = PreloadedPrimaryKeyRelatedField(queryset=Category.objects.all())
+
+    # Loads the authors and categories referenced by the raw items, keyed by primary key.
+    @staticmethod
+    def preload(items):
+        def ids(name):
+            values = set()
+            for item in items:
+                try:
+                    values.add(int(item.get(name)))
+                except (AttributeError, TypeError, ValueError):
+                    pass
+            return values
+        return {
+            'Author': User.objects.in_bulk(ids('Author')),
+            'Category': Category.objects.in_bulk(ids('Category')),
+        }
+
+    # Creates all validated blogs in one transaction: tags are resolved with one bulk insert and one lookup,
+    # blogs and blog/tag rows are inserted in batches. Returns the created blogs.
+    @staticmethod
+    def create_many(validated_items, batch_size=500):
+        timestamp = now()
+        tag_names = {name for item in validated_items for name in item.get('tags', [])}
+        with transaction.atomic():
+            Tag.objects.bulk_create([Tag(name=name) for name in tag_names], ignore_conflicts=True)
+            tag_ids = dict(Tag.objects.filter(name__in=tag_names).values_list('name', 'id'))
+            blogs = [
+                Blog(
+                    Title=item['Title'],
+                    Content=item['Content'],
+                    Excerpt=make_excerpt(item['Content']),
+                    Author=item['Author'],
+                    Category=item['Category'],
+                    Published_Date=timestamp if item.get('published_now') else None,
+                )
+                for item in validated_items
+            ]
+            bulk_insert_blogs(blogs, batch_size)
+            Blog.tags.through.objects.bulk_create(
+                [
+                    Blog.tags.through(blog_id=blog.id, tag_id=tag_ids[name])
+                    for blog, item in zip(blogs, validated_items)
+                    for name in dict.fromkeys(item.get('tags', []))
+                ],
+                batch_size=batch_size,
+            )
+            # Count the published blogs in their categories and tags, from the data at hand.
+            counters.record_changes(
+                (None, (blog.Category_id, frozenset(tag_ids[name] for name in item.get('tags', []))))
+                for blog, item in zip(blogs, validated_items)
+                if blog.Published_Date is not None
+            )
+            # Index the new blogs from the data at hand, without reading them back.
+            search.index_documents(
+                (blog.id, [blog.Title, blog.Content, ' '.join(dict.fromkeys(item.get('tags', []))), blog.Author.username])
+                for blog, item in zip(blogs, validated_items)
+            )
+            related.schedule_refresh([blog.id for blog in blogs if blog.Published_Date is not None])
+            autocomplete.add_tags(tag_ids.items())
+            autocomplete.update_titles(blogs)
+        caching.invalidate_blogs([blog.id for blog in blogs])
+        return blogs
+
+
+# Category metadata. Its blogs are not embedded: the category endpoints add a bounded page of its published
+# blogs (see CategoryListView and CategoryDetailView).
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['name', 'blogs']
-    
+        fields = ['id', 'name', 'post_count']
+        read_only_fields = ['post_count']
+
     def create(self, validated_data):
         category = Category.objects.create(**validated_data)
-        return category
\ No newline at end of file
+        return category
+
+
+# Category with its number of published blogs.
+class CategoryStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'post_count']
+
+
+# Tag with its number of published blogs.
+class TagCountSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tag
+        fields = ['name', 'post_count']
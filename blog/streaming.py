@@ -0,0 +1,10 @@
+from Blogging_Platform_Api.streaming import get_stream_format, stream
+from .serializers import BlogSerializer
+
+# Blog exports on top of the generic streaming responses (Blogging_Platform_Api.streaming).
+__all__ = ['get_stream_format', 'stream_blogs']
+
+
+# Streams the blogs of a queryset (or search results) without holding them all in memory.
+def stream_blogs(blogs, stream_format, fields=None):
+    return stream(blogs, stream_format, BlogSerializer(fields=fields))
@@ -1,3 +1,899 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from accounts.models import User
+from jobs.queue import Worker
+from Blogging_Platform_Api import compression, db, renderers
+from Blogging_Platform_Api.instrumentation import histogram
+from .models import Blog, Category, RelatedBlog, Tag
+from .serializers import BlogSerializer, BlogValuesSerializer
+from . import autocomplete, caching, counters, export, importer, related, search
 
-# Create your tests here.
+
+# Creates an author, a category and a number of published blogs with two tags each.
+def create_blogs(count, title='Post'):
+    author = User.objects.create_user(username='author', email='author@example.com', password='password')
+    category = Category.objects.create(name='Technology')
+    for i in range(count):
+        serializer = BlogSerializer(data={
+            'Title': f'{title} {i}',
+            'Content': f'Content of {title.lower()} {i}',
+            'Author': author.id,
+            'Category': category.id,
+            'tags': [f'tag{i}', 'common'],
+            'published_now': True,
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+    # Index the blogs in the search index
+    Worker().run_pending()
+    return author, category
+
+
+# Query budget for every blog read path: the number of queries must not depend on the number of blogs rendered.
+class BlogQueryBudgetTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_blogs(25)
+        self.client = APIClient()
+
+    def test_list_query_budget(self):
+        # count, page, tags prefetch
+        with self.assertNumQueries(3):
+            response = self.client.get('/blog/list/?limit=25')
+        self.assertEqual(len(response.json()['results']), 25)
+
+    def test_list_cursor_query_budget(self):
+        first_page = self.client.get('/blog/list/?cursor=&limit=10').json()
+        # page, tags prefetch: no count and no offset scan on deep pages
+        with self.assertNumQueries(2):
+            response = self.client.get(first_page['next'])
+        self.assertEqual(len(response.json()['results']), 10)
+
+    def test_detail_query_budget(self):
+        blog = Blog.objects.first()
+        # blog, tags prefetch
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/blog/detail/{blog.id}/')
+        self.assertEqual(len(response.json()['tags']), 2)
+
+    def test_search_query_budget(self):
+        # index count, index page ids, blogs, tags prefetch
+        with self.assertNumQueries(4):
+            response = self.client.get('/blog/search/?q=post&limit=25')
+        self.assertEqual(len(response.json()['results']), 25)
+
+    def test_filter_query_budget(self):
+        # blogs, tags prefetch
+        with self.assertNumQueries(2):
+            response = self.client.get('/blog/filter/?Category=Technology')
+        self.assertEqual(len(response.json()), 25)
+
+    def test_category_list_query_budget(self):
+        Category.objects.create(name='Empty')
+        # count, categories, windowed blogs, tags
+        with self.assertNumQueries(4):
+            response = self.client.get('/blog/category/list/?posts=3')
+        empty, technology = response.json()['results']
+        self.assertEqual(empty['posts'], [])
+        self.assertEqual([blog['Title'] for blog in technology['posts']], ['Post 24', 'Post 23', 'Post 22'])
+        # The category's next blogs continue after the embedded ones
+        response = self.client.get(technology['posts_next'])
+        self.assertEqual(response.json()['posts']['results'][0]['Title'], 'Post 21')
+
+    def test_category_detail_query_budget(self):
+        # category, page, tags
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/blog/category/{self.category.id}/?limit=20')
+        data = response.json()
+        self.assertEqual((data['name'], data['post_count']), ('Technology', 25))
+        self.assertEqual(len(data['posts']['results']), 20)
+        self.assertEqual(len(self.client.get(data['posts']['next']).json()['posts']['results']), 5)
+
+
+# Cached detail and list payloads: served without queries, answered with 304 when unchanged, invalidated on writes.
+class BlogCacheTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_blogs(3)
+        self.blog = Blog.objects.first()
+        self.client = APIClient()
+
+    def test_detail_served_from_cache(self):
+        first = self.client.get(f'/blog/detail/{self.blog.id}/')
+        with self.assertNumQueries(0):
+            second = self.client.get(f'/blog/detail/{self.blog.id}/')
+        self.assertEqual(first.json(), second.json())
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/blog/detail/{self.blog.id}/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_served_from_cache(self):
+        first = self.client.get('/blog/list/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/blog/list/')
+        self.assertEqual(first.json(), second.json())
+        with self.assertNumQueries(0):
+            response = self.client.get('/blog/list/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_update_invalidates_cache(self):
+        detail = self.client.get(f'/blog/detail/{self.blog.id}/')
+        listing = self.client.get('/blog/list/')
+        self.client.force_authenticate(self.author)
+        self.client.put(f'/blog/update/{self.blog.id}/', {'Title': 'Changed', 'tags': ['new'], 'published_now': True}, format='json')
+        response = self.client.get(f'/blog/detail/{self.blog.id}/', HTTP_IF_NONE_MATCH=detail['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['tags'], ['new'])
+        response = self.client.get('/blog/list/', HTTP_IF_NONE_MATCH=listing['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Changed', [blog['Title'] for blog in response.json()['results']])
+
+    def test_deleting_author_invalidates_cache(self):
+        self.assertEqual(self.client.get(f'/blog/detail/{self.blog.id}/').status_code, 200)
+        self.assertEqual(self.client.get('/blog/list/').json()['count'], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.delete()
+        self.assertEqual(self.client.get(f'/blog/detail/{self.blog.id}/').status_code, 404)
+        self.assertEqual(self.client.get('/blog/list/').json()['count'], 0)
+
+
+# Bulk creation: constant number of queries for any batch size, errors reported per item.
+class BlogBulkCreateTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='password')
+        self.category = Category.objects.create(name='Technology')
+        self.client = APIClient()
+
+    def items(self, count):
+        return [
+            {'Title': f'Bulk {i}', 'Content': 'Content', 'Author': self.author.id,
+             'Category': self.category.id, 'tags': [f'tag{i % 5}', 'bulk'], 'published_now': True}
+            for i in range(count)
+        ]
+
+    def test_bulk_create_query_budget(self):
+        # authors, categories, savepoint, tag insert, tag lookup, blog insert, blog/tag insert,
+        # category and tag counters, search index delete and insert, related blogs job, savepoint release
+        with self.assertNumQueries(13):
+            response = self.client.post('/blog/bulk-create/', self.items(100), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['count'], 100)
+        self.assertEqual(Blog.tags.through.objects.count(), 200)
+        self.assertEqual(self.client.get('/blog/search/?q=bulk').json()['count'], 100)
+
+    def test_bulk_create_without_returned_ids(self):
+        # Backends such as MySQL do not return the new ids from a bulk insert: still one insert, ids read back
+        Blog.objects.create(Title='Existing', Content='Content', Author=self.author, Category=self.category)
+        features = type(connection.features)
+        with mock.patch.object(features, 'can_return_rows_from_bulk_insert', False), CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/blog/bulk-create/', self.items(20), format='json')
+        self.assertEqual(response.status_code, 201)
+        blog_inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "blog_blog" ')]
+        self.assertEqual(len(blog_inserts), 1)
+        for blog in Blog.objects.exclude(Title='Existing').prefetch_related('tags'):
+            number = int(blog.Title.split()[1])
+            self.assertEqual(sorted(tag.name for tag in blog.tags.all()), ['bulk', f'tag{number % 5}'])
+
+    def test_bulk_create_reports_errors_per_item(self):
+        items = self.items(3)
+        items[1]['Category'] = 999
+        del items[2]['Title']
+        response = self.client.post('/blog/bulk-create/', items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2])
+        self.assertFalse(Blog.objects.exists())
+
+
+# Async read endpoints return the same payloads as their sync counterparts.
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        create_blogs(5)
+        self.blog = Blog.objects.first()
+
+    async def test_async_views_match_sync_views(self):
+        client = AsyncClient()
+        for sync_path, async_path in [
+            (f'/blog/detail/{self.blog.id}/', f'/blog/async/detail/{self.blog.id}/'),
+            ('/blog/list/?limit=3&offset=1&sort=-Published_Date', '/blog/async/list/?limit=3&offset=1&sort=-Published_Date'),
+            ('/blog/search/?q=post&limit=3', '/blog/async/search/?q=post&limit=3'),
+        ]:
+            expected = (await client.get(sync_path)).json()
+            response = await client.get(async_path)
+            self.assertEqual(response.status_code, 200)
+            actual = response.json()
+            if isinstance(expected, dict) and 'next' in expected:
+                for key in ('next', 'previous'):
+                    expected[key] = expected[key] and expected[key].replace('/blog/', '/blog/async/')
+            self.assertEqual(actual, expected)
+
+    async def test_async_filter_paginated(self):
+        client = AsyncClient()
+        expected = (await client.get('/blog/filter/?Category=Technology')).json()
+        expected.sort(key=lambda blog: blog['Title'], reverse=True)
+        data = (await client.get('/blog/async/filter/?Category=Technology&limit=3')).json()
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(data['results'], expected[:3])
+        data = (await client.get(data['next'])).json()
+        self.assertEqual(data['results'], expected[3:])
+
+    async def test_async_list_served_from_cache(self):
+        client = AsyncClient()
+        first = await client.get('/blog/async/list/')
+        self.assertEqual(first['Content-Type'], 'application/json')
+        response = await client.get('/blog/async/list/', headers={'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+
+# Returns the plan steps of a query (sqlite EXPLAIN QUERY PLAN details, MySQL EXPLAIN rows as dicts).
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute('EXPLAIN ' + sql)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+# Returns the plan steps of a query that read the whole posts table, through an index or not: sqlite's
+# 'SCAN <table>' (including 'SCAN <table> USING [COVERING] INDEX ...'), MySQL's 'ALL' and 'index' access types.
+def full_scans(sql, table='blog_blog'):
+    if connection.vendor == 'sqlite':
+        return [step for step in query_plan(sql) if re.match(rf'SCAN {table}\b', step)]
+    return [str(row) for row in query_plan(sql) if row.get('table') == table and row.get('type') in ('ALL', 'index')]
+
+
+# Returns the names of the indexes a query uses.
+def used_indexes(sql):
+    if connection.vendor == 'sqlite':
+        return {match for step in query_plan(sql) for match in re.findall(r'USING (?:COVERING )?INDEX (\w+)', step)}
+    return {row.get('key') for row in query_plan(sql) if row.get('key')}
+
+
+# Query plan regression checks: the main queries of the blog endpoints must not scan the posts table.
+class BlogQueryPlanTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_blogs(30)
+        self.blog = Blog.objects.first()
+        self.client = APIClient()
+        caching.get_cache().clear()
+
+    # Checks that no query of the request scans the posts table and, if given, that one of `indexes` is used.
+    def assertNoFullScan(self, path, indexes=()):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        used = set()
+        for query in context.captured_queries:
+            sql = query['sql']
+            if sql.startswith('SELECT') and 'blog_blog' in sql:
+                self.assertEqual(full_scans(sql), [], f'{path}: {sql}')
+                used |= used_indexes(sql)
+        if indexes:
+            self.assertTrue(used & set(indexes), f'{path}: none of {indexes} in {used}')
+
+    def test_detail_plan(self):
+        self.assertNoFullScan(f'/blog/detail/{self.blog.id}/')
+
+    def test_list_plan(self):
+        # The partial index of published blogs, or the plain one on databases without partial indexes
+        indexes = ('blog_published_only_idx', 'blog_published_date_idx')
+        self.assertNoFullScan('/blog/list/', indexes)
+        self.assertNoFullScan('/blog/list/?sort=-Published_Date', indexes)
+        self.assertNoFullScan('/blog/list/?cursor=&sort=-Published_Date', indexes)
+
+    def test_search_plan(self):
+        self.assertNoFullScan('/blog/search/?q=post')
+
+    def test_filter_plan(self):
+        self.assertNoFullScan('/blog/filter/?Category=Technology')
+        self.assertNoFullScan('/blog/filter/?Author=author')
+
+
+# Server-Timing header and timing histogram recorded by ServerTimingMiddleware.
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        create_blogs(3)
+        caching.get_cache().clear()
+        histogram.clear()
+        self.client = APIClient()
+
+    def test_server_timing_header(self):
+        response = self.client.get('/blog/list/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="3 queries"', response['Server-Timing'])
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+
+    def test_timing_stats_admin_only(self):
+        self.client.get('/blog/list/')
+        self.client.get(f'/blog/detail/{Blog.objects.first().id}/')
+        self.assertEqual(self.client.get('/stats/timings/').status_code, 401)
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        stats = self.client.get('/stats/timings/').json()
+        self.assertEqual(stats['list']['count'], 1)
+        self.assertEqual(stats['list']['avg_queries'], 3)
+        self.assertEqual(stats['blog/detail']['count'], 1)
+
+
+# Streaming search and filter responses contain the same blogs as the buffered ones.
+class StreamingTests(TestCase):
+    def setUp(self):
+        create_blogs(5)
+        self.client = APIClient()
+
+    def test_filter_stream_json(self):
+        expected = self.client.get('/blog/filter/?Category=Technology').json()
+        response = self.client.get('/blog/filter/?Category=Technology&stream=json')
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), expected)
+
+    def test_search_stream_ndjson(self):
+        response = self.client.get('/blog/search/?q=post&stream=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(all(json.loads(line)['Title'].startswith('Post') for line in lines))
+
+
+# Sparse fieldsets: list endpoints render the excerpt by default and only load the requested columns.
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        create_blogs(3)
+        self.client = APIClient()
+
+    def test_list_defaults_to_excerpt(self):
+        blog = self.client.get('/blog/list/').json()['results'][0]
+        self.assertNotIn('Content', blog)
+        self.assertTrue(blog['Excerpt'].startswith('Content of post'))
+
+    def test_fields_projection(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/blog/filter/?Category=Technology&fields=Title,Published_Date')
+        self.assertEqual(set(response.json()[0]), {'Title', 'Published_Date'})
+        # Only the blogs query: Content/Excerpt are deferred and tags are not prefetched
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('"Content"', context.captured_queries[0]['sql'])
+
+
+class ValuesSerializerTests(TestCase):
+    def setUp(self):
+        create_blogs(5)
+
+    def test_same_output_as_blog_serializer(self):
+        blogs = Blog.objects.order_by('id')
+        for fields in (None, BlogSerializer.list_fields, ['Title', 'Category']):
+            expected = BlogSerializer(blogs.prefetch_related('tags'), many=True, fields=fields).data
+            rows = BlogValuesSerializer.get_queryset(blogs, fields or BlogValuesSerializer.columns)
+            self.assertEqual(BlogValuesSerializer(rows, fields=fields).data, [dict(blog) for blog in expected])
+
+    def test_tags_in_one_query(self):
+        rows = BlogValuesSerializer.get_queryset(Blog.objects.all(), ['tags'])
+        with self.assertNumQueries(2):
+            BlogValuesSerializer(rows, fields=['tags']).data
+
+
+# Stored post counters: kept in step with blog writes, repaired by reconcile, read by the stats endpoints.
+class PostCounterTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_blogs(3)
+        self.blog = Blog.objects.order_by('id').first()
+        self.client = APIClient()
+
+    def counts(self):
+        self.category.refresh_from_db()
+        return self.category.post_count, dict(Tag.objects.values_list('name', 'post_count'))
+
+    def test_counters_follow_writes(self):
+        self.assertEqual(self.counts(), (3, {'tag0': 1, 'tag1': 1, 'tag2': 1, 'common': 3}))
+        self.client.force_authenticate(self.author)
+        # Unpublishing and retagging
+        self.client.put(f'/blog/update/{self.blog.id}/', {'Title': 'Draft', 'tags': ['new']}, format='json')
+        self.assertEqual(self.counts(), (2, {'tag0': 0, 'tag1': 1, 'tag2': 1, 'common': 2, 'new': 0}))
+        self.client.delete(f'/blog/delete/{Blog.objects.order_by("id").last().id}/')
+        self.assertEqual(self.counts(), (1, {'tag0': 0, 'tag1': 1, 'tag2': 0, 'common': 1, 'new': 0}))
+        items = [{'Title': 'Bulk', 'Content': 'Bulk', 'Author': self.author.id, 'Category': self.category.id,
+                  'tags': ['common'], 'published_now': True}]
+        self.client.post('/blog/bulk-create/', items, format='json')
+        self.assertEqual(self.counts(), (2, {'tag0': 0, 'tag1': 1, 'tag2': 0, 'common': 2, 'new': 0}))
+        self.assertEqual(counters.reconcile(), (0, 0))
+
+    def test_deleting_author_uncounts_blogs(self):
+        self.author.delete()
+        self.assertEqual(self.counts(), (0, {'tag0': 0, 'tag1': 0, 'tag2': 0, 'common': 0}))
+        self.assertEqual(self.client.get('/blog/tags/top/').json(), [])
+
+    def test_reconcile_repairs_drift(self):
+        Tag.objects.filter(name='common').update(post_count=10)
+        Category.objects.update(post_count=0)
+        self.assertEqual(counters.reconcile(), (1, 1))
+        self.assertEqual(self.counts(), (3, {'tag0': 1, 'tag1': 1, 'tag2': 1, 'common': 3}))
+
+    def test_stats_endpoints(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/blog/category/stats/')
+        self.assertEqual(response.json(), [{'id': self.category.id, 'name': 'Technology', 'post_count': 3}])
+        with self.assertNumQueries(1):
+            response = self.client.get('/blog/tags/top/?limit=2')
+        self.assertEqual(response.json(), [{'name': 'common', 'post_count': 3}, {'name': 'tag0', 'post_count': 1}])
+
+
+# Read replica routing: GETs of the blog views read from a replica, except right after the client wrote.
+@override_settings(READ_REPLICAS=['replica'])
+class ReadReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_blogs(1)
+        self.blog = Blog.objects.first()
+        self.client = APIClient()
+        caching.get_cache().clear()
+
+    def test_router(self):
+        router = db.ReadReplicaRouter()
+        token = db.read_replica.set('replica')
+        try:
+            # TestCase runs every test in a transaction, which keeps reads on the primary
+            self.assertEqual(router.db_for_read(Blog), 'default')
+            with mock.patch.object(connection, 'in_atomic_block', False):
+                self.assertEqual(router.db_for_read(Blog), 'replica')
+                self.assertEqual(router.db_for_write(Blog), 'default')
+        finally:
+            db.read_replica.reset(token)
+        self.assertEqual(router.db_for_read(Blog), 'default')
+
+    def test_reads_go_to_replica_until_client_writes(self):
+        # The replica is reported unavailable, so the reads still hit the test database.
+        with mock.patch.object(db, 'choose_replica', return_value=None) as choose_replica:
+            self.client.force_authenticate(self.author)
+            self.assertEqual(self.client.get('/blog/list/', HTTP_AUTHORIZATION='Token a').status_code, 200)
+            self.assertEqual(choose_replica.call_count, 1)
+            # Async views are routed the same way
+            self.client.get('/blog/async/list/', HTTP_AUTHORIZATION='Token a')
+            self.assertEqual(choose_replica.call_count, 2)
+            self.client.put(f'/blog/update/{self.blog.id}/', {'Title': 'Changed', 'published_now': True},
+                            format='json', HTTP_AUTHORIZATION='Token a')
+            self.client.get(f'/blog/detail/{self.blog.id}/', HTTP_AUTHORIZATION='Token a')
+            self.client.get(f'/blog/async/detail/{self.blog.id}/', HTTP_AUTHORIZATION='Token a')
+            self.assertEqual(choose_replica.call_count, 2)
+            # Another client is not pinned
+            self.client.get('/blog/list/?limit=5', HTTP_AUTHORIZATION='Token b')
+            self.assertEqual(choose_replica.call_count, 3)
+
+    def test_replica_reads_are_not_cached_after_a_write(self):
+        self.client.force_authenticate(self.author)
+        with mock.patch.object(db, 'choose_replica', return_value='replica'):
+            self.client.put(f'/blog/update/{self.blog.id}/', {'Title': 'Changed', 'published_now': True},
+                            format='json', HTTP_AUTHORIZATION='Token a')
+            # Another client reads from the replica, which may not have the write yet: not cached
+            self.client.get('/blog/list/', HTTP_AUTHORIZATION='Token b')
+            with self.assertNumQueries(3):
+                self.client.get('/blog/list/', HTTP_AUTHORIZATION='Token b')
+            # The writer reads from the primary, which is cached
+            self.client.get('/blog/list/', HTTP_AUTHORIZATION='Token a')
+            with self.assertNumQueries(0):
+                self.client.get('/blog/list/', HTTP_AUTHORIZATION='Token b')
+            # Replica reads are cached again once the sticky window is over
+            caching.invalidate_blog(self.blog.id)
+            with override_settings(READ_REPLICA_STICKY_SECONDS=0):
+                self.client.get('/blog/list/', HTTP_AUTHORIZATION='Token b')
+                with self.assertNumQueries(0):
+                    self.client.get('/blog/list/', HTTP_AUTHORIZATION='Token b')
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        db.replica_health.clear()
+        with override_settings(READ_REPLICAS=['missing']):
+            self.assertIsNone(db.choose_replica())
+            self.assertEqual(self.client.get('/blog/list/').status_code, 200)
+
+
+# Response compression: negotiated, skipped for small bodies, streamed, and cached pages compressed once.
+class CompressionTests(TestCase):
+    def setUp(self):
+        create_blogs(10)
+        self.client = APIClient()
+        caching.get_cache().clear()
+
+    def test_negotiate(self):
+        self.assertEqual(compression.negotiate('gzip, deflate, br'), 'gzip')
+        self.assertEqual(compression.negotiate('gzip;q=0, identity'), None)
+        self.assertEqual(compression.negotiate('*'), next(iter(compression.COMPRESSORS)))
+        self.assertEqual(compression.negotiate(''), None)
+
+    def test_cached_page_compressed_once(self):
+        plain = self.client.get('/blog/list/')
+        with mock.patch.object(compression, 'compress', wraps=compression.compress) as compress:
+            first = self.client.get('/blog/list/', HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get('/blog/list/', HTTP_ACCEPT_ENCODING='gzip')
+        compress.assert_not_called()
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(gzip.decompress(first.content), plain.content)
+        self.assertIn('Accept-Encoding', first['Vary'])
+        # The weakened ETag still validates
+        response = self.client.get('/blog/list/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_uncached_and_small_responses(self):
+        response = self.client.get('/blog/search/?q=post', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['count'], 10)
+        response = self.client.get('/blog/search/?q=nothing', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_response(self):
+        plain = b''.join(self.client.get('/blog/filter/?Category=Technology&stream=ndjson').streaming_content)
+        response = self.client.get('/blog/filter/?Category=Technology&stream=ndjson', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+
+# Fast JSON renderer and parser: same output as DRF's, with and without orjson.
+class FastJSONTests(TestCase):
+    data = {
+        'date': datetime(2024, 5, 1, 12, 30, 15, 250000, tzinfo=timezone.utc),
+        'price': Decimal('9.99'),
+        'label': gettext_lazy('Title'),
+        'text': 'caf\u00e9 \u2028',
+        'ids': [1, 2, 3],
+    }
+
+    def test_same_output_as_drf(self):
+        expected = JSONRenderer().render(self.data)
+        self.assertEqual(renderers.stdlib_dumps(self.data), expected)
+        self.assertEqual(renderers.dumps(self.data), expected)
+        self.assertEqual(renderers.FastJSONRenderer().render(self.data), expected)
+        self.assertEqual(renderers.loads(expected), json.loads(expected))
+
+    def test_indented_output_left_to_drf(self):
+        rendered = renderers.FastJSONRenderer().render(self.data, 'application/json; indent=2')
+        self.assertEqual(rendered, JSONRenderer().render(self.data, 'application/json; indent=2'))
+
+    def test_parser(self):
+        parser = renderers.FastJSONParser()
+        self.assertEqual(parser.parse(BytesIO(b'{"Title": "caf\xc3\xa9"}')), {'Title': 'caf\u00e9'})
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"Title": '))
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"Title": NaN}'))
+
+    def test_api_uses_fast_renderer(self):
+        create_blogs(3)
+        response = APIClient().get('/blog/search/?q=post')
+        self.assertIsInstance(response.accepted_renderer, renderers.FastJSONRenderer)
+        self.assertEqual(response.json()['count'], 3)
+
+
+# Bulk export: admin only, gzip-compressed NDJSON and CSV, tags read once per batch of blogs.
+class BlogExportTests(TestCase):
+    def setUp(self):
+        create_blogs(10)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def test_ndjson_export(self):
+        response = self.client.get('/blog/export/')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.ndjson.gz', response['Content-Disposition'])
+        lines = gzip.decompress(b''.join(response.streaming_content)).splitlines()
+        self.assertEqual(len(lines), 10)
+        first = json.loads(lines[0])
+        self.assertEqual((first['Title'], first['Category'], first['Author']), ('Post 0', 'Technology', 'author'))
+        self.assertEqual(sorted(first['tags']), ['common', 'tag0'])
+
+    def test_csv_export(self):
+        response = self.client.get('/blog/export/?type=csv')
+        rows = list(csv.reader(gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()))
+        self.assertEqual(rows[0], export.COLUMNS)
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(sorted(rows[1][export.COLUMNS.index('tags')].split('|')), ['common', 'tag0'])
+        self.assertEqual(self.client.get('/blog/export/?type=xml').status_code, 400)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(User.objects.get(username='author'))
+        self.assertEqual(self.client.get('/blog/export/').status_code, 403)
+
+    def test_tags_read_per_batch(self):
+        # One query for the blogs, one per batch of 4 for their tags
+        with self.assertNumQueries(4):
+            chunks = list(export.generate('ndjson', batch_size=4))
+        self.assertEqual(sum(chunk.count(b'\n') for chunk in chunks), 10)
+
+    def test_command_default_file_name(self):
+        directory = tempfile.mkdtemp()
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            call_command('export_blogs', '--no-gzip', '--type=csv', stdout=StringIO())
+            call_command('export_blogs', stdout=StringIO())
+            self.assertEqual(sorted(os.listdir(directory)), [export.file_name('csv', compressed=False), export.file_name('ndjson')])
+            with open(export.file_name('csv', compressed=False)) as file:
+                self.assertEqual(file.readline().strip(), ','.join(export.COLUMNS))
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(directory)
+
+
+# Bulk import: streamed JSON lines and CSV, maps resolved once, invalid records skipped.
+class BlogImportTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_blogs(2)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def import_file(self, path, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_blogs', path, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_jsonl_import(self):
+        lines = [
+            {'Title': 'Imported', 'Content': 'Imported content', 'Category': 'Technology', 'Author': 'author',
+             'tags': ['common', 'imported'], 'Published_Date': '2024-05-01T10:00:00Z'},
+            {'Title': 'Draft', 'Content': 'Draft content', 'Category': 'Travel', 'Author': 'author'},
+            {'Title': 'No content', 'Category': 'Travel', 'Author': 'author'},
+            {'Title': 'Ghost', 'Content': 'Ghost content', 'Category': 'Travel', 'Author': 'ghost'},
+        ]
+        path = self.write('blogs.jsonl', '\n'.join(json.dumps(line) for line in lines) + '\nnot json\n')
+        stdout, stderr = self.import_file(path, '--chunk-size', '2')
+        self.assertIn('Imported 2 blogs', stdout)
+        self.assertIn('skipped 3', stdout)
+        self.assertIn("Line 4: Unknown author 'ghost'.", stderr)
+        blog = Blog.objects.get(Title='Imported')
+        self.assertEqual(sorted(blog.tags.values_list('name', flat=True)), ['common', 'imported'])
+        self.assertEqual(blog.Excerpt, 'Imported content')
+        self.assertIsNone(Blog.objects.get(Title='Draft').Published_Date)
+        self.assertTrue(Category.objects.filter(name='Travel').exists())
+        # Counters and search index are maintained
+        self.assertEqual(counters.reconcile(), (0, 0))
+        self.assertEqual(self.client.get('/blog/search/?q=imported').json()['count'], 1)
+
+    def test_csv_round_trip(self):
+        path = os.path.join(self.directory, 'blogs.csv.gz')
+        call_command('export_blogs', '--type', 'csv', '--output', path, stdout=StringIO())
+        self.import_file(path)
+        self.assertEqual(Blog.objects.filter(Title='Post 1').count(), 2)
+        self.assertEqual(counters.reconcile(), (0, 0))
+
+    def test_parallel_parsing_keeps_order(self):
+        raw = [(number, json.dumps({'Title': f'Post {number}', 'Content': 'Content', 'Category': 'Technology',
+                                    'Author': 'author'})) for number in range(1, 8)]
+        inline = list(importer.parse_chunks(iter(raw), 'jsonl', 2))
+        parallel = list(importer.parse_chunks(iter(raw), 'jsonl', 2, workers=2))
+        self.assertEqual(parallel, inline)
+        self.assertEqual([record.title for records, _ in inline for record in records][-1], 'Post 7')
+
+
+# Related blogs: ranked by weighted tag overlap and category, refreshed in the background when tags change.
+class RelatedBlogsTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_blogs(3)
+        self.other_category = Category.objects.create(name='Cooking')
+        self.first = self.create('First', ['python', 'django', 'web'])
+        self.second = self.create('Second', ['python', 'django'])
+        self.third = self.create('Third', ['python'])
+        self.recipe = self.create('Recipe', ['soup'], self.other_category)
+        Worker().run_pending()
+
+    def create(self, title, tags, category=None):
+        serializer = BlogSerializer(data={
+            'Title': title, 'Content': f'{title} content', 'Author': self.author.id,
+            'Category': (category or self.category).id, 'tags': tags, 'published_now': True,
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def related_titles(self, blog):
+        return [row['Title'] for row in self.client.get(f'/blog/detail/{blog.id}/related/?limit=10').json()]
+
+    def test_ranking(self):
+        titles = self.related_titles(self.first)
+        # Shared tags first, more shared tags first; blogs of the same category follow, other categories are left out
+        self.assertEqual(titles[:2], ['Second', 'Third'])
+        self.assertNotIn('Recipe', titles)
+        self.assertNotIn('First', titles)
+        # A rare shared tag outweighs a common one
+        self.assertGreater(related.tag_weight(1, 100), related.tag_weight(50, 100))
+
+    def test_refreshed_when_tags_change(self):
+        serializer = BlogSerializer(self.recipe, data={'tags': ['python', 'django', 'web'], 'published_now': True}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        Worker().run_pending()
+        # Only the recipe's list was recomputed, it was inserted into the others'
+        self.assertEqual(self.related_titles(self.first)[0], 'Recipe')
+        self.assertEqual(self.related_titles(self.recipe)[0], 'First')
+        # Same lists as a full rebuild (scores of untouched lists drift with the tag counts until then)
+        pairs = set(RelatedBlog.objects.values_list('blog', 'related'))
+        related.rebuild()
+        self.assertEqual(set(RelatedBlog.objects.values_list('blog', 'related')), pairs)
+        self.assertEqual(self.related_titles(self.first)[0], 'Recipe')
+
+    def test_query_budget(self):
+        # Related ids, their blogs and their tags
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/blog/detail/{self.first.id}/related/')
+        self.assertEqual(len(response.json()), 5)
+        self.assertEqual(self.client.get('/blog/detail/0/related/').status_code, 404)
+
+
+# Faceted search: category, author and tag counts over all the results in one query, AND-combined selections.
+class SearchFacetTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_blogs(4)
+        travel = Category.objects.create(name='Travel')
+        serializer = BlogSerializer(data={
+            'Title': 'Post in Rome', 'Content': 'Travel post', 'Author': self.author.id,
+            'Category': travel.id, 'tags': ['tag1', 'italy'], 'published_now': True,
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        Worker().run_pending()
+
+    def test_facet_counts(self):
+        # Count, page ids, page rows, page tags and all facets
+        with self.assertNumQueries(5):
+            response = self.client.get('/blog/search/?q=post&facets=true&limit=2')
+        data = response.json()
+        self.assertEqual((data['count'], len(data['results'])), (5, 2))
+        self.assertEqual(data['facets']['Category'], [{'value': 'Technology', 'count': 4}, {'value': 'Travel', 'count': 1}])
+        self.assertEqual(data['facets']['Author'], [{'value': 'author', 'count': 5}])
+        self.assertEqual(data['facets']['tags'][:2], [{'value': 'common', 'count': 4}, {'value': 'tag1', 'count': 2}])
+        response = self.client.get('/blog/search/?q=post&facets=tags&facet_limit=1')
+        self.assertEqual(response.json()['facets'], {'tags': [{'value': 'common', 'count': 4}]})
+
+    def test_selections_are_combined(self):
+        data = self.client.get('/blog/search/?q=post&tags=tag1&facets=Category').json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(len(data['facets']['Category']), 2)
+        data = self.client.get('/blog/search/?q=post&tags=tag1&Category=Travel&facets=Category').json()
+        self.assertEqual([blog['Title'] for blog in data['results']], ['Post in Rome'])
+        self.assertEqual(data['facets']['Category'], [{'value': 'Travel', 'count': 1}])
+        self.assertEqual(self.client.get('/blog/search/?q=post&tags=tag1&tags=italy&Author=nobody').json()['count'], 0)
+        # Without a query, selections and facets apply to every blog
+        data = self.client.get('/blog/search/?Category=Technology&facets=Author').json()
+        self.assertEqual(data['facets']['Author'], [{'value': 'author', 'count': 4}])
+        self.assertEqual(self.client.get('/blog/search/?facets=Title').status_code, 400)
+
+
+# Autocomplete of tags (by popularity) and titles (latest first) from the in-memory indexes.
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_blogs(3, title='Python')
+        Tag.objects.create(name='Pythonic')
+        autocomplete.warm_up()
+
+    def test_ranking_without_queries(self):
+        with self.assertNumQueries(0):
+            tags = autocomplete.complete('tags', 'TAG', 10)
+            self.assertEqual(autocomplete.complete('tags', 'co', 10), [{'name': 'common', 'post_count': 3}])
+        self.assertEqual(sorted(tag['name'] for tag in tags), ['tag0', 'tag1', 'tag2'])
+        # The most used tags first
+        response = self.client.get('/blog/autocomplete/?q=&limit=2')
+        self.assertEqual(response.json()[0], {'name': 'common', 'post_count': 3})
+        self.assertEqual(len(response.json()), 2)
+        titles = self.client.get('/blog/autocomplete/?q=python &type=titles').json()
+        self.assertEqual([title['Title'] for title in titles], ['Python 2', 'Python 1', 'Python 0'])
+        self.assertEqual(self.client.get('/blog/autocomplete/?q=x&type=users').status_code, 400)
+
+    def test_updated_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer = BlogSerializer(data={
+                'Title': 'Pythonic code', 'Content': 'Content', 'Author': self.author.id,
+                'Category': self.category.id, 'tags': ['idioms'], 'published_now': True,
+            })
+            serializer.is_valid(raise_exception=True)
+            blog = serializer.save()
+        self.assertEqual(autocomplete.complete('tags', 'idi', 10), [{'name': 'idioms', 'post_count': 0}])
+        self.assertEqual(autocomplete.complete('titles', 'pythonic', 10), [{'id': blog.id, 'Title': 'Pythonic code'}])
+        # New tags start without popularity, a rebuild loads their counts
+        self.assertEqual(autocomplete.build('tags').complete('idi', 1), [(Tag.objects.get(name='idioms').id, 'idioms', 1)])
+        # Renamed and unpublished: the title is no longer offered
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer = BlogSerializer(blog, data={'Title': 'Idiomatic code'}, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        self.assertEqual(autocomplete.complete('titles', 'pythonic', 10), [])
+        self.assertEqual(autocomplete.complete('titles', 'idiomatic', 10), [])
+
+    def test_stale_index_rebuilt_in_background(self):
+        index = autocomplete.get_index('tags')
+        Tag.objects.create(name='tagged')
+        with override_settings(AUTOCOMPLETE_REFRESH=0), mock.patch.object(autocomplete, 'start_rebuild') as start_rebuild:
+            # The stale index is still served, without queries, and one rebuild is started
+            with self.assertNumQueries(0):
+                self.assertIs(autocomplete.get_index('tags'), index)
+                self.assertIs(autocomplete.get_index('tags'), index)
+            start_rebuild.assert_called_once_with('tags')
+
+            # A tag committed while the index is loaded is not lost when the new index replaces it
+            def load_tags():
+                with self.captureOnCommitCallbacks(execute=True):
+                    autocomplete.add_tags([('late', 999)])
+                return autocomplete.load_tags()
+            with mock.patch.dict(autocomplete.LOADERS, tags=load_tags), mock.patch.object(autocomplete.connections, 'close_all'):
+                autocomplete.rebuild('tags')
+        self.assertIsNot(autocomplete.get_index('tags'), index)
+        self.assertEqual(autocomplete.complete('tags', 'tagg', 1), [{'name': 'tagged', 'post_count': 0}])
+        self.assertEqual(autocomplete.complete('tags', 'lat', 1), [{'name': 'late', 'post_count': 0}])
+        self.assertFalse(autocomplete.build_lock.locked())
+
+
+# Full-text search: ranked prefix matches, and entries removed with their blogs, including cascades from authors.
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.author, self.category = create_blogs(3, title='Gardening')
+        serializer = BlogSerializer(data={
+            'Title': 'Weekly notes', 'Content': 'Some gardening tips', 'Author': self.author.id,
+            'Category': Category.objects.create(name='Notes').id, 'tags': ['misc'], 'published_now': True,
+        })
+        serializer.is_valid(raise_exception=True)
+        self.notes = serializer.save()
+        Worker().run_pending()
+
+    def search(self, query):
+        return self.client.get(f'/blog/search/?q={query}').json()
+
+    def test_ranked_prefix_matches(self):
+        data = self.search('garden')
+        self.assertEqual(data['count'], 4)
+        # Title matches rank above content matches
+        self.assertEqual(data['results'][-1]['Title'], 'Weekly notes')
+        self.assertEqual(self.search('gardening tag1')['results'][0]['Title'], 'Gardening 1')
+        self.assertEqual(self.search('weekly')['count'], 1)
+
+    def test_deleted_blogs_leave_the_index(self):
+        self.notes.delete()
+        self.assertEqual(self.search('garden')['count'], 3)
+        self.author.delete()
+        self.assertEqual(self.search('garden')['count'], 0)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {search.SEARCH_TABLE}')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_created_blogs_searchable_without_worker(self):
+        response = APIClient().post('/blog/create/', {
+            'Title': 'Hello world', 'Content': 'First post', 'Author': self.author.id, 'Category': self.category.id,
+            'tags': ['intro'], 'published_now': True,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.search('hello')['count'], 1)
+
+    def test_renames_reindex_blogs(self):
+        self.author.username = 'gardener'
+        self.author.save()
+        tag = Tag.objects.get(name='misc')
+        tag.name = 'compost'
+        tag.save()
+        Worker().run_pending()
+        self.assertEqual(self.search('gardener')['count'], 4)
+        self.assertEqual(self.search('author')['count'], 0)
+        self.assertEqual(self.search('compost')['count'], 1)
+        self.assertEqual(self.search('misc')['count'], 0)
+
+    def test_rebuild_index_in_batches(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.SEARCH_TABLE}')
+        with mock.patch.object(search.SQLiteSearchBackend, 'index_many', autospec=True,
+                               side_effect=search.SQLiteSearchBackend.index_many) as index_many:
+            self.assertEqual(search.rebuild_index(), 4)
+        self.assertEqual(index_many.call_count, 1)
+        self.assertEqual(self.search('garden')['count'], 4)
@@ -1,14 +1,28 @@
 from django.urls import path
-from .views import BlogDetailView,BlogCreateView,BlogUpdateView,BlogDeleteView, CategoryCreateView, SearchView, BlogFilterView, BlogListView
+from .async_views import AsyncBlogDetailView, AsyncBlogListView, AsyncSearchView, AsyncBlogFilterView
+from .views import BlogDetailView, RelatedBlogsView,BlogCreateView,BlogBulkCreateView,BlogUpdateView,BlogDeleteView, CategoryCreateView, CategoryListView, CategoryDetailView, CategoryStatsView, TopTagsView, AutocompleteView, BlogExportView, SearchView, BlogFilterView, BlogListView
 
 
 urlpatterns = [
-    path('detail/<int:id>/', BlogDetailView.as_view(), name='blog/list'),
+    path('detail/<int:id>/', BlogDetailView.as_view(), name='blog/detail'),
+    path('detail/<int:id>/related/', RelatedBlogsView.as_view(), name='blog/related'),
     path('create/', BlogCreateView.as_view(), name='blog/create'),
+    path('bulk-create/', BlogBulkCreateView.as_view(), name='blog/bulk-create'),
     path('update/<int:id>/', BlogUpdateView.as_view(), name='blog/update'),
     path('delete/<int:id>/', BlogDeleteView.as_view(), name='blog/delete'),
     path('category/create/', CategoryCreateView.as_view(), name='category/create'),
+    path('category/list/', CategoryListView.as_view(), name='category/list'),
+    path('category/<int:id>/', CategoryDetailView.as_view(), name='category/detail'),
+    path('category/stats/', CategoryStatsView.as_view(), name='category/stats'),
+    path('tags/top/', TopTagsView.as_view(), name='tags/top'),
+    path('autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
     path('search/', SearchView.as_view(), name='search'),
     path('filter/', BlogFilterView.as_view(), name='filter'),
     path('list/', BlogListView.as_view(), name='list'),
+    path('export/', BlogExportView.as_view(), name='blog/export'),
+    # Async (ASGI-native) variants of the read endpoints.
+    path('async/detail/<int:id>/', AsyncBlogDetailView.as_view(), name='async/detail'),
+    path('async/search/', AsyncSearchView.as_view(), name='async/search'),
+    path('async/filter/', AsyncBlogFilterView.as_view(), name='async/filter'),
+    path('async/list/', AsyncBlogListView.as_view(), name='async/list'),
 ]
\ No newline at end of file
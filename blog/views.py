@@ -1,14 +1,21 @@
 from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .serializers import BlogSerializer, CategorySerializer, TagSerializer
-from .models import Blog
+from .serializers import BlogSerializer, BlogBulkSerializer, BlogValuesSerializer, CategorySerializer, CategoryStatsSerializer, TagCountSerializer, TagSerializer
+from .models import Blog, Category, Tag
+from accounts.models import User
 from rest_framework.permissions import IsAdminUser, BasePermission
-from django.db.models import Q
-from .pagination import BlogPagination
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.urls import reverse
+from .pagination import BlogPagination, BlogCursorPagination, parse_limit
+from . import autocomplete, caching as blog_caching, export, related, search
+from .streaming import get_stream_format, stream_blogs
 from rest_framework.filters import OrderingFilter
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.exceptions import NotFound
+from accounts.authentication import CachedTokenAuthentication
+from rest_framework.exceptions import NotFound, ValidationError
+from django.http import StreamingHttpResponse
 
 # Custom permission class to check if the user is the owner (author) of the object.
 class IsOwner(BasePermission):
@@ -30,15 +37,67 @@ class BlogCreateView(APIView):
         return Response(serializer.errors, status=400)
     
 
+# BlogBulkCreateView to handle the creation of many blogs in a single API request
+class BlogBulkCreateView(APIView):
+    # Maximum number of blogs accepted in one request
+    max_items = 1000
+
+    # Handle POST requests carrying a list of blogs; either all of them are created or none
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "Expected a non-empty list of blogs."}, status=400)
+        if len(items) > self.max_items:
+            return Response({"detail": f"At most {self.max_items} blogs can be created at once."}, status=400)
+        # Validate every item, with authors and categories of the whole batch loaded up front
+        context = {'preloaded': BlogBulkSerializer.preload(items)}
+        item_serializers = [BlogBulkSerializer(data=item, context=context) for item in items]
+        errors = [
+            {"index": index, "errors": serializer.errors}
+            for index, serializer in enumerate(item_serializers)
+            if not serializer.is_valid()
+        ]
+        # Report the errors per item, nothing is created
+        if errors:
+            return Response({"errors": errors}, status=400)
+        blogs = BlogBulkSerializer.create_many([serializer.validated_data for serializer in item_serializers])
+        return Response({"count": len(blogs), "ids": [blog.id for blog in blogs]}, status=201)
+
+
 # BlogDetailView to handle the retrieval of a specific Blog via an API request
 class BlogDetailView(APIView):
 
     # Handle GET requests to retrieve details of a specific blog by its ID
     def get(self, request, *args, **kwargs):
-        blog = Blog.objects.get(id=kwargs['id'])
-        serializer = BlogSerializer(blog)
-        return Response(serializer.data, status=200)
+        # Serve the cached payload when there is one, otherwise serialize the blog and cache it
+        entry = blog_caching.get_detail(kwargs['id'])
+        if entry is None:
+            try:
+                blog = BlogSerializer.setup_eager_loading(Blog.objects.all()).get(id=kwargs['id'])
+            except Blog.DoesNotExist:
+                raise NotFound("Blog not found")
+            serializer = BlogSerializer(blog)
+            entry = blog_caching.set_detail(blog, serializer.data)
+        # Returns the payload with ETag/Last-Modified headers, or a 304 if the client is up to date
+        return blog_caching.cached_response(request, entry)
     
+# RelatedBlogsView returns the published blogs related to a blog, best first ('?limit=', 5 by default,
+# at most RELATED_POSTS_SIZE), read from the precomputed lists of blog.related.
+class RelatedBlogsView(APIView):
+    default_limit = 5
+
+    def get(self, request, *args, **kwargs):
+        limit = parse_limit(request.query_params.get('limit'), self.default_limit, related.get_size())
+        fields = BlogSerializer.get_requested_fields(request.query_params)
+        ids = related.get_related_ids(kwargs['id'], limit)
+        if not ids and not Blog.objects.filter(id=kwargs['id']).exists():
+            raise NotFound("Blog not found")
+        blogs = Blog.objects.filter(id__in=ids, Published_Date__isnull=False)
+        rows = {row['id']: row for row in BlogValuesSerializer.get_queryset(blogs, fields)}
+        serializer = BlogValuesSerializer([rows[blog_id] for blog_id in ids if blog_id in rows], fields=fields)
+        return Response(serializer.data, status=200)
+
+
 # BlogUpdateView to handle the updating of an existing Blog via an API request 
 class BlogUpdateView(APIView):
     # Only the owner (author) of the blog can update it.
@@ -75,7 +134,7 @@ class BlogDeleteView(APIView):
     # Permission to delete: owner or admin
     permission_classes = [IsOwner | IsAdminUser]
     # Token-based authentication
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def get_object(self, id):
         try:
@@ -90,7 +149,12 @@ class BlogDeleteView(APIView):
     def delete(self, request, *args, **kwargs):
         # Get blog object by id and delete
         blog = self.get_object(kwargs['id'])
-        blog.delete()
+        with transaction.atomic():
+            # Removes the blog from the autocomplete index (it is uncounted from its category and tags, removed
+            # from the full-text search index and dropped from the cache by the delete receivers of blog.counters,
+            # blog.search and blog.caching)
+            autocomplete.update_titles([], removed=[(blog.Title, blog.id)])
+            blog.delete()
         # Return successful response with no content
         return Response(status=204)
     
@@ -107,17 +171,170 @@ class CategoryCreateView(APIView):
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
     
+# Latest published blogs of each given category, at most `limit` per category, as values() rows keyed by
+# category id. One windowed query numbers the blogs of every category, whatever the number of categories.
+def latest_category_blogs(category_ids, limit, fields):
+    position = Window(RowNumber(), partition_by=F('Category'), order_by=[F('Published_Date').desc(), F('id').desc()])
+    blogs = (Blog.objects.filter(Category__in=category_ids, Published_Date__isnull=False)
+             .annotate(position=position).filter(position__lte=limit)
+             .order_by('Category', '-Published_Date', '-id'))
+    rows = {category_id: [] for category_id in category_ids}
+    for row in BlogValuesSerializer.get_queryset(blogs, fields):
+        rows[row['Category_id']].append(row)
+    return rows
+
+
+# CategoryListView returns a page of categories, each with its metadata and its latest published blogs
+# ('?posts=', 5 by default, at most 20) and a link to the following blogs of the category.
+class CategoryListView(APIView):
+    pagination_class = BlogPagination
+    default_posts = 5
+    max_posts = 20
+
+    def get(self, request, *args, **kwargs):
+        posts = parse_limit(request.query_params.get('posts'), self.default_posts, self.max_posts)
+        fields = BlogSerializer.get_requested_fields(request.query_params)
+        paginator = self.pagination_class()
+        categories = paginator.paginate_queryset(Category.objects.order_by('name', 'id'), request, view=self)
+        rows = latest_category_blogs([category.id for category in categories], posts, fields)
+        # Tags of the blogs of every category on the page are fetched together
+        blogs = iter(BlogValuesSerializer([row for category in categories for row in rows[category.id]], fields=fields).data)
+        results = []
+        for category in categories:
+            data = CategorySerializer(category).data
+            data['posts'] = [next(blogs) for _ in rows[category.id]]
+            data['posts_next'] = None
+            if len(rows[category.id]) == posts:
+                url = request.build_absolute_uri(reverse('category/detail', kwargs={'id': category.id}))
+                data['posts_next'] = BlogCursorPagination().get_link_after(url, Blog, rows[category.id][-1])
+            results.append(data)
+        return paginator.get_paginated_response(results)
+
+
+# CategoryDetailView returns a category's metadata and one cursor-paginated page of its published blogs.
+class CategoryDetailView(APIView):
+    cursor_pagination_class = BlogCursorPagination
+
+    def get(self, request, *args, **kwargs):
+        try:
+            category = Category.objects.get(id=kwargs['id'])
+        except Category.DoesNotExist:
+            raise NotFound("Category not found")
+        fields = BlogSerializer.get_requested_fields(request.query_params)
+        blogs = Blog.objects.filter(Category=category, Published_Date__isnull=False)
+        # Newest first by default; pages are read from the (Category, Published_Date) index
+        paginator = self.cursor_pagination_class()
+        page = paginator.paginate_queryset(BlogValuesSerializer.get_queryset(blogs, fields), request, view=self)
+        data = CategorySerializer(category).data
+        data['posts'] = paginator.get_paginated_response(BlogValuesSerializer(page, fields=fields).data).data
+        return Response(data, status=200)
+
+
+# CategoryStatsView returns every category with its number of published blogs, read from the stored counters.
+class CategoryStatsView(APIView):
+    def get(self, request, *args, **kwargs):
+        categories = Category.objects.order_by('-post_count', 'name')
+        serializer = CategoryStatsSerializer(categories, many=True)
+        return Response(serializer.data, status=200)
+
+
+# TopTagsView returns the 'limit' most used tags (tag cloud), read from the stored counters in index order.
+class TopTagsView(APIView):
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        limit = parse_limit(request.query_params.get('limit'), self.default_limit, self.max_limit)
+        tags = Tag.objects.filter(post_count__gt=0).order_by('-post_count', 'name')[:limit]
+        serializer = TagCountSerializer(tags, many=True)
+        return Response(serializer.data, status=200)
+
+
+# AutocompleteView completes what an editor is typing ('?q=') from the in-memory indexes of blog.autocomplete:
+# the most used tags starting with it ('?type=tags', the default) or the latest published blogs whose title
+# starts with it ('?type=titles'). Returns at most '?limit=' results (10 by default, at most 50).
+class AutocompleteView(APIView):
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        index = request.query_params.get('type', 'tags')
+        if index not in autocomplete.INDEXES:
+            raise ValidationError({'type': f"Expected one of: {', '.join(autocomplete.INDEXES)}."})
+        limit = parse_limit(request.query_params.get('limit'), self.default_limit, self.max_limit)
+        return Response(autocomplete.complete(index, request.query_params.get('q', ''), limit), status=200)
+
+
+# BlogExportView streams every blog with its category, author and tags for analytics,
+# as a gzip-compressed NDJSON ('?type=ndjson', the default) or CSV ('?type=csv') file. Admin users only.
+class BlogExportView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get('type', 'ndjson')
+        if export_format not in export.EXPORT_FORMATS:
+            raise ValidationError({'type': f"Expected one of: {', '.join(export.EXPORT_FORMATS)}."})
+        response = StreamingHttpResponse(export.generate_gzip(export_format), content_type='application/gzip')
+        response['Content-Disposition'] = f'attachment; filename="{export.file_name(export_format)}"'
+        return response
+
+
 class SearchView(APIView):
+    # Search results are paginated with the same limit/offset parameters as the blog list
+    pagination_class = BlogPagination
+    # Values returned per facet ('?facet_limit=')
+    default_facet_limit = 10
+    max_facet_limit = 50
+
     def get(self, request, *args, **kwargs):
         # Get search query parameter (default is empty string)
         query = request.query_params.get('q', '')
-        # Filter blogs based on query in title, content, tags, or author's username
-        blogs = Blog.objects.filter(Q(Title__icontains=query) | Q(Content__icontains=query)
-                                    | Q(tags__name__icontains=query) | Q(Author__username__icontains=query))
-        # Serialize the filtered blogs and return them in the response
-        serializer = BlogSerializer(blogs, many=True)
-        return Response(serializer.data, status=200) # Return serialized data with a 200 OK status
-    
+        # Fields to render ('?fields=', the list representation by default); other text columns are not loaded
+        fields = BlogSerializer.get_requested_fields(request.query_params)
+        # Facet selections, all required: '?Category=', '?Author=' and any number of '?tags='
+        filters = search.facet_filters(request.query_params.get('Category'), request.query_params.get('Author'),
+                                       request.query_params.getlist('tags'))
+        facets = self.get_facets(request)
+        # Stream every result ('?stream=json' or '?stream=ndjson') instead of returning one page
+        stream_format = get_stream_format(request)
+        if stream_format:
+            blogs = search.search(query, BlogSerializer.setup_eager_loading(Blog.objects.all(), fields), filters)
+            return stream_blogs(blogs, stream_format, fields)
+        # Match the query against the full-text index (title, content, tags, author's username), ranked by relevance
+        blogs = search.search(query, BlogValuesSerializer.get_queryset(Blog.objects.all(), fields), filters)
+        # Paginate the results so only the requested page is fetched from the index, as values() rows
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(blogs, request, view=self)
+        # Serialize the page of blogs and return it in the response
+        serializer = BlogValuesSerializer(page, fields=fields)
+        response = paginator.get_paginated_response(serializer.data)
+        # Counts of the requested facets over all the results, computed with one query
+        if facets:
+            limit = parse_limit(request.query_params.get('facet_limit'), self.default_facet_limit, self.max_facet_limit)
+            response.data['facets'] = search.facet_counts(blogs, facets, limit)
+        return response
+
+    # Facets requested with '?facets=' (comma separated names, or 'true' for all of them).
+    def get_facets(self, request):
+        value = request.query_params.get('facets', '')
+        if value.lower() in ('', 'false', '0'):
+            return []
+        if value.lower() in ('true', '1', 'all'):
+            return list(search.FACETS)
+        facets = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in facets if name not in search.FACETS]
+        if unknown:
+            raise ValidationError({'facets': f"Unknown facets: {', '.join(unknown)}. Expected: {', '.join(search.FACETS)}."})
+        return facets
+
+# Condition matching blogs of a category (by name) or an author (by username).
+# Both sides are id subqueries on the foreign key columns, so each can use its index
+# instead of scanning blog_blog through the joins.
+def category_or_author(category, author):
+    return (Q(Category__in=Category.objects.filter(name=category).values('id'))
+            | Q(Author__in=User.objects.filter(username=author).values('id')))
+
+
 class BlogFilterView(APIView):
     # Handle GET request to filter blogs by category or author
     def get(self, request, *args, **kwargs):
@@ -125,22 +342,46 @@ class BlogFilterView(APIView):
         category = request.query_params.get('Category', '')
         author = request.query_params.get('Author', '')
         # Filter blogs by matching category or author
-        blogs = Blog.objects.filter(Q(Category__name=category) | Q(Author__username=author))
-        # Serialize the filtered blogs
-        serializer = BlogSerializer(blogs, many=True)
+        blogs = Blog.objects.filter(category_or_author(category, author))
+        fields = BlogSerializer.get_requested_fields(request.query_params)
+        # Stream the blogs ('?stream=json' or '?stream=ndjson') instead of building the whole list in memory
+        stream_format = get_stream_format(request)
+        if stream_format:
+            return stream_blogs(BlogSerializer.setup_eager_loading(blogs, fields), stream_format, fields)
+        # Serialize the filtered blogs from values() rows, with the tags of all of them fetched in one query
+        serializer = BlogValuesSerializer(BlogValuesSerializer.get_queryset(blogs, fields), fields=fields)
         # Return the serialized blog data with a 200 OK status
         return Response(serializer.data, status=200)
     
 class BlogListView(APIView):
     # Set pagination class and filter backends for ordering
     pagination_class = BlogPagination
+    # Keyset pagination, used when the request carries a 'cursor' parameter (empty for the first page)
+    cursor_pagination_class = BlogCursorPagination
     filter_backends = [OrderingFilter]
     ordering_fields = ['Published_Date', 'Category']
 
-    # Handle GET request to retrieve and paginate blogs
+    # Handle GET request to retrieve and paginate blogs, served from the cache when possible
     def get(self, request, *args, **kwargs):
+        key, entry = blog_caching.list_page(request, 'list')
+        # Clients holding the current version get a 304 before anything is fetched or serialized
+        if blog_caching.not_modified(request, entry) is None:
+            entry = blog_caching.get_list(key) or blog_caching.set_list(key, entry, self.list_blogs(request).data)
+        return blog_caching.cached_response(request, entry)
+
+    # Builds the paginated blog list from the database
+    def list_blogs(self, request):
         # Filter blogs with a non-null Published_Date
         blogs = Blog.objects.filter(Published_Date__isnull=False).all()
+        # Load only the columns of the requested fields as values() rows; the tags of the page are fetched in one query
+        fields = BlogSerializer.get_requested_fields(request.query_params)
+        blogs = BlogValuesSerializer.get_queryset(blogs, fields)
+        # Cursor mode: the paginator applies the ordering and the keyset condition itself
+        if self.cursor_pagination_class.cursor_query_param in request.query_params:
+            paginator = self.cursor_pagination_class()
+            page = paginator.paginate_queryset(blogs, request, view=self)
+            serializer = BlogValuesSerializer(page, fields=fields)
+            return paginator.get_paginated_response(serializer.data)
         # Initialize the paginator
         paginator = self.pagination_class()
         # Get sorting parameter from query and apply ordering if present
@@ -151,8 +392,8 @@ class BlogListView(APIView):
         page = paginator.paginate_queryset(blogs, request, view=self)
         # If pagination applied, return paginated response
         if page is not None:
-            serializer = BlogSerializer(page, many=True)
+            serializer = BlogValuesSerializer(page, fields=fields)
             return paginator.get_paginated_response(serializer.data)
         # Return all blogs without pagination if no pagination is needed
-        serializer = BlogSerializer(blogs, many=True)
+        serializer = BlogValuesSerializer(blogs, fields=fields)
         return Response(serializer.data, status=200)
\ No newline at end of file
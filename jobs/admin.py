@@ -0,0 +1,5 @@
+from django.contrib import admin
+from .models import Job
+
+# Registers the Job model with the admin site to inspect and retry background jobs.
+admin.site.register(Job)
@@ -0,0 +1,41 @@
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from jobs.queue import Worker
+
+
+# Management command running a job queue worker.
+# It processes batches of due jobs, sleeps when there is none, and stops after the current batch
+# on SIGINT/SIGTERM. Several workers can run at once, on one or more machines.
+class Command(BaseCommand):
+    help = 'Runs a background job worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the due jobs, then exit.')
+        parser.add_argument('--batch-size', type=int, help='Jobs claimed at once (JOBS_BATCH_SIZE by default).')
+        parser.add_argument('--sleep', type=float, help='Seconds to wait when no job is due (JOBS_POLL_INTERVAL by default).')
+
+    def handle(self, *args, **options):
+        worker = Worker(batch_size=options['batch_size'])
+        if options['once']:
+            worker.release_stale()
+            total = worker.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Processed {total} jobs.'))
+            return
+
+        sleep = options['sleep'] or getattr(settings, 'JOBS_POLL_INTERVAL', 1)
+        self.stopping = False
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        self.stdout.write(f'Worker {worker.worker_id} started.')
+        while not self.stopping:
+            close_old_connections()
+            worker.release_stale()
+            if not worker.run_once():
+                time.sleep(sleep)
+        self.stdout.write(f'Worker {worker.worker_id} stopped.')
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,35 @@
+from django.db import models
+from django.utils.timezone import now
+
+
+# Model to represent a background job: a handler (dotted path to a function) and its JSON payload.
+class Job(models.Model):
+    # Jobs are deleted once they succeed; failed jobs are kept until they are retried or removed by hand.
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    handler = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    # Earliest time the job may run (pushed back after each failed attempt).
+    run_at = models.DateTimeField(default=now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # Worker holding the job and when it claimed it, to recover jobs of crashed workers.
+    locked_by = models.CharField(max_length=64, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Due jobs in claim order.
+            models.Index(fields=['status', 'run_at', 'id'], name='job_due_idx'),
+            # Jobs held by a worker.
+            models.Index(fields=['locked_by'], name='job_locked_by_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.handler} #{self.pk} ({self.status})'
@@ -0,0 +1,124 @@
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+from uuid import uuid4
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Database-backed job queue.
+# A job names its handler by dotted path; handlers take the list of payloads of a batch of jobs with the
+# same handler, so work of the same kind is done together (e.g. indexing many blogs with one query).
+# Jobs are inserted in the caller's transaction: they are committed with the write that needs them and
+# rolled back with it. Workers (the run_jobs command) claim due jobs with SELECT ... FOR UPDATE SKIP LOCKED
+# where the database supports it, and with a conditional UPDATE otherwise (sqlite, which has one writer
+# at a time). Failed jobs are retried with exponential backoff, then kept as failed.
+
+
+# Adds a job, run by a worker after `delay` seconds at the earliest.
+# With JOBS_INLINE, the handler runs in-process once the current transaction commits instead.
+def enqueue(handler, payload=None, delay=0, max_attempts=None):
+    payload = payload or {}
+    if getattr(settings, 'JOBS_INLINE', False):
+        transaction.on_commit(lambda: import_string(handler)([payload]))
+        return None
+    return Job.objects.create(
+        handler=handler,
+        payload=payload,
+        run_at=now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or getattr(settings, 'JOBS_MAX_ATTEMPTS', 5),
+    )
+
+
+# Seconds to wait before the next attempt of a job that failed `attempts` times: doubles with every
+# attempt up to JOBS_RETRY_MAX, with up to 10% jitter so failed batches do not retry in lockstep.
+def backoff(attempts):
+    base = getattr(settings, 'JOBS_RETRY_BASE', 5)
+    delay = min(base * 2 ** (attempts - 1), getattr(settings, 'JOBS_RETRY_MAX', 3600))
+    return delay * random.uniform(1, 1.1)
+
+
+class Worker:
+    def __init__(self, batch_size=None, worker_id=None):
+        self.batch_size = batch_size or getattr(settings, 'JOBS_BATCH_SIZE', 100)
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}'
+
+    # Claims up to batch_size due jobs with the same handler as the oldest due job.
+    # Returns the handler and the claimed jobs (attempts already counted).
+    def claim(self):
+        claimed_at = now()
+        due = Job.objects.filter(status=Job.PENDING, run_at__lte=claimed_at).order_by('run_at', 'id')
+        skip_locked = connection.features.has_select_for_update_skip_locked
+        with transaction.atomic():
+            if skip_locked:
+                # Rows locked by other workers are skipped instead of waited for.
+                due = due.select_for_update(skip_locked=True)
+            handler = due.values_list('handler', flat=True).first()
+            if handler is None:
+                return None, []
+            ids = list(due.filter(handler=handler).values_list('id', flat=True)[:self.batch_size])
+            # The status condition makes the claim atomic without row locks: a job another worker
+            # claimed in the meantime is no longer pending and is left alone.
+            Job.objects.filter(id__in=ids, status=Job.PENDING).update(
+                status=Job.RUNNING, locked_by=self.worker_id, locked_at=claimed_at, attempts=F('attempts') + 1,
+            )
+        jobs = list(Job.objects.filter(id__in=ids, locked_by=self.worker_id, locked_at=claimed_at))
+        return handler, jobs
+
+    # Claims and runs one batch, returns the number of jobs it held.
+    def run_once(self):
+        handler, jobs = self.claim()
+        if not jobs:
+            return 0
+        if not self.run(handler, jobs) and len(jobs) > 1:
+            # One bad payload must not hold back the others: retry the batch one job at a time.
+            for job in jobs:
+                self.run(handler, [job])
+        return len(jobs)
+
+    # Runs the jobs' handler in a transaction. Succeeded jobs are deleted, failed ones rescheduled.
+    # Returns True on success.
+    def run(self, handler, jobs):
+        try:
+            with transaction.atomic():
+                import_string(handler)([job.payload for job in jobs])
+        except Exception:
+            error = traceback.format_exc()
+            logger.warning('Job handler %s failed for %d job(s):\n%s', handler, len(jobs), error)
+            if len(jobs) == 1:
+                self.fail(jobs[0], error)
+            return False
+        Job.objects.filter(id__in=[job.id for job in jobs]).delete()
+        return True
+
+    def fail(self, job, error):
+        job.last_error = error
+        job.locked_by, job.locked_at = '', None
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+        else:
+            job.status = Job.PENDING
+            job.run_at = now() + timedelta(seconds=backoff(job.attempts))
+        job.save(update_fields=['status', 'run_at', 'last_error', 'locked_by', 'locked_at'])
+
+    # Puts back the jobs of workers that died while running them (claimed more than JOBS_LOCK_TIMEOUT ago).
+    def release_stale(self):
+        expired = now() - timedelta(seconds=getattr(settings, 'JOBS_LOCK_TIMEOUT', 600))
+        return Job.objects.filter(status=Job.RUNNING, locked_at__lt=expired).update(
+            status=Job.PENDING, locked_by='', locked_at=None,
+        )
+
+    # Runs batches until no job is due, returns the number of jobs processed.
+    def run_pending(self):
+        total = 0
+        while processed := self.run_once():
+            total += processed
+        return total
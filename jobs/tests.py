@@ -0,0 +1,72 @@
+from datetime import timedelta
+from django.db import transaction
+from django.test import TestCase
+from django.utils.timezone import now
+from .models import Job
+from .queue import Worker, enqueue
+
+# Payload batches received by the test handlers.
+calls = []
+
+
+def record(payloads):
+    calls.append(payloads)
+
+
+def fail_on_bad(payloads):
+    if any(payload.get('bad') for payload in payloads):
+        raise ValueError('bad payload')
+    calls.append(payloads)
+
+
+# Job queue: batching by handler, retries with backoff, recovery of abandoned jobs.
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker(batch_size=10)
+
+    def test_batches_by_handler(self):
+        for i in range(3):
+            enqueue('jobs.tests.record', {'n': i})
+        enqueue('jobs.tests.fail_on_bad', {'n': 3})
+        # Claim (savepoint, handler, ids, update, release, jobs), run (savepoint, release) and delete:
+        # a constant number of queries per batch
+        with self.assertNumQueries(9):
+            self.assertEqual(self.worker.run_once(), 3)
+        self.assertEqual(calls, [[{'n': 0}, {'n': 1}, {'n': 2}]])
+        self.assertEqual(self.worker.run_pending(), 1)
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_job_retried_with_backoff(self):
+        enqueue('jobs.tests.fail_on_bad', {'bad': True}, max_attempts=2)
+        enqueue('jobs.tests.fail_on_bad', {'n': 1})
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.worker.run_pending()
+        # The good payload went through on its own, the bad one waits for its next attempt
+        self.assertEqual(calls, [[{'n': 1}]])
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertGreater(job.run_at, now() + timedelta(seconds=4))
+        self.assertIn('bad payload', job.last_error)
+        Job.objects.update(run_at=now())
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.worker.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_jobs_follow_the_transaction(self):
+        try:
+            with transaction.atomic():
+                enqueue('jobs.tests.record', {'n': 1})
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(Job.objects.exists())
+
+    def test_abandoned_jobs_released(self):
+        job = enqueue('jobs.tests.record', {'n': 1})
+        Job.objects.filter(pk=job.pk).update(status=Job.RUNNING, locked_by='dead', locked_at=now() - timedelta(hours=1))
+        self.assertEqual(self.worker.run_pending(), 0)
+        self.assertEqual(self.worker.release_stale(), 1)
+        self.assertEqual(self.worker.run_pending(), 1)
+        self.assertEqual(calls, [[{'n': 1}]])